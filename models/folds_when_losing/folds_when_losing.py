@@ -3,7 +3,7 @@ from pktools.feature_engineering.winning_prob import estimate_proba
 
 def make_decision(input):
     
-    proba = estimate_proba(input['hand'],input['community'], input['n_players'])
+    proba = estimate_proba(input['hand ints'], input['community ints'], input['n_players'])
 
     if proba > 0.9:
         return 100000000
@@ -53,30 +53,38 @@ class Card():
     # hearts and diamonds
     PRETTY_REDS = [2, 4]
 
+    # precomputed conversions between the 52 card strings and ints, see the end of the module
+    STR_TO_INT = {}
+    INT_TO_STR = {}
+
     @staticmethod
-    def str_to_int(strings):
+    def new(string):
         """
         Converts Card string to binary integer representation of card, inspired by:
 
         http://www.suffecool.net/poker/evaluator.html
         """
+        rank_char = string[0]
+        suit_char = string[1]
+        rank_int = Card.CHAR_RANK_TO_INT_RANK[rank_char]
+        suit_int = Card.CHAR_SUIT_TO_INT_SUIT[suit_char]
+        rank_prime = Card.PRIMES[rank_int]
 
-        if type(strings) == str:
-            strings = [strings]
-
-        cards = []
+        bitrank = 1 << rank_int << 16
+        suit = suit_int << 12
+        rank = rank_int << 8
+        return bitrank | suit | rank | rank_prime
 
-        for string in strings:
-            rank_char = string[0]
-            suit_char = string[1]
-            rank_int = Card.CHAR_RANK_TO_INT_RANK[rank_char]
-            suit_int = Card.CHAR_SUIT_TO_INT_SUIT[suit_char]
-            rank_prime = Card.PRIMES[rank_int]
+    @staticmethod
+    def str_to_int(strings):
+        """
+        Converts Card string(s) to binary integer representation, from the precomputed table.
+        A single card gives an int, several cards a list.
+        """
+        if type(strings) == str:
+            return Card.STR_TO_INT[strings]
 
-            bitrank = 1 << rank_int << 16
-            suit = suit_int << 12
-            rank = rank_int << 8
-            cards += [bitrank | suit | rank | rank_prime]
+        cards = [Card.STR_TO_INT[string] for string in strings]
 
         if len(cards) == 1:
             cards = cards[0]
@@ -87,14 +95,9 @@ class Card():
     def int_to_str(card_ints):
 
         if type(card_ints) == int:
-            card_ints = [card_ints]
+            return Card.INT_TO_STR[card_ints]
 
-        card_strings = []
-        for card_int in card_ints:
-            rank_int = Card.get_rank_int(card_int)
-            suit_int = Card.get_suit_int(card_int)
-            full_string = Card.STR_RANKS[rank_int] + Card.PRETTY_SUITS[suit_int]
-            card_strings += [full_string]
+        card_strings = [Card.INT_TO_STR[card_int] for card_int in card_ints]
 
         if len(card_strings) == 1:
             card_strings = card_strings[0]
@@ -121,11 +124,17 @@ class Card():
         """
         Expects a list of cards as strings and returns a list
         of integers of same length corresponding to those strings.
+        Cards already in integer form are kept as they are.
         """
-        bhand = []
-        for c in card_strs:
-            bhand.append(Card.str_to_int(c))
-        return bhand
+        return [Card.STR_TO_INT[c] if type(c) == str else c for c in card_strs]
+
+    @staticmethod
+    def hand_to_str(card_ints):
+        """
+        Expects a list of cards in integer form and returns a list
+        of strings of same length corresponding to those integers.
+        """
+        return [Card.INT_TO_STR[c] for c in card_ints]
 
     @staticmethod
     def prime_product_from_hand(card_ints):
@@ -235,3 +244,9 @@ class Card():
                 output += Card.int_to_pretty_str(c) + " "
 
         print(output)
+
+
+for _rank_char in Card.STR_RANKS:
+    for _suit_char in Card.CHAR_SUIT_TO_INT_SUIT:
+        Card.STR_TO_INT[_rank_char + _suit_char] = Card.new(_rank_char + _suit_char)
+Card.INT_TO_STR = {card_int: string for string, card_int in Card.STR_TO_INT.items()}
@@ -1,33 +1,93 @@
-from random import shuffle
+import random
+import numpy as np
 from pktools.deuces.card import Card
 
 class Deck:
     """
-    Class representing a deck. The first time we create, we seed the static 
+    Class representing a deck. The first time we create, we seed the static
     deck with the list of unique card integers. Each object instantiated simply
-    makes a copy of this object and shuffles it. 
+    makes a copy of this object, without the dead cards, and shuffles it.
+
+    Cards are drawn by moving a cursor along the shuffled list, so a draw is
+    O(1) per card. Shuffles use rng: a seed, a random.Random instance, or by
+    default the global random module.
+
+    cards is the deck's own list of the cards left, as in the former list
+    based deck: pop(), remove(), append()... on it change the deck. Once it
+    has been taken, draws delete the drawn cards from it to keep it up to
+    date, which costs O(cards left) like the former pop(0).
     """
     _FULL_DECK = []
 
-    def __init__(self):
+    def __init__(self, dead=(), rng=None):
+        if rng is not None and not isinstance(rng, random.Random):
+            rng = random.Random(rng)
+        self.rng = rng if rng is not None else random
+        self.dead = set(dead)
         self.shuffle()
 
     def shuffle(self):
         # and then shuffle
-        self.cards = Deck.GetFullDeck()
-        shuffle(self.cards)
+        self._cards = Deck.GetLiveCards(self.dead)
+        self.rng.shuffle(self._cards)
+        self._position = 0
+        self._bound = False
+
+    @property
+    def cards(self):
+        """the deck's list of the cards left, in drawing order (see the class docstring)"""
+        self._bound = True
+        self.__compact()
+        return self._cards
+
+    @cards.setter
+    def cards(self, cards):
+        self._cards = list(cards)
+        self._position = 0
+        self._bound = False
+
+    def __compact(self):
+        # drops the drawn cards from the list
+        if self._position:
+            del self._cards[:self._position]
+            self._position = 0
+
+    def __advance(self, n):
+        self._position += n
+        if self._bound:
+            self.__compact()
 
     def draw(self, n=1):
         if n == 1:
-            return self.cards.pop(0)
+            if self._position >= len(self._cards):
+                raise IndexError('draw from an empty deck')
+            card = self._cards[self._position]
+            self.__advance(1)
+            return card
 
-        cards = []
-        for i in range(n):
-            cards.append(self.draw())
+        if self._position + n > len(self._cards):
+            raise IndexError('cannot draw %d cards, %d left' % (n, len(self._cards) - self._position))
+        cards = self._cards[self._position:self._position + n]
+        self.__advance(n)
         return cards
 
+    def deal(self, n_hands, n_cards=2):
+        """draws n_hands hands of n_cards cards at once"""
+        cards = self._cards[self._position:self._position + n_hands * n_cards]
+        if len(cards) < n_hands * n_cards:
+            raise IndexError('cannot deal %d hands, %d cards left' % (n_hands, len(cards)))
+        self.__advance(n_hands * n_cards)
+        return [cards[i * n_cards:(i + 1) * n_cards] for i in range(n_hands)]
+
+    def exclude(self, cards):
+        """marks cards as dead, removing them from the cards left to draw"""
+        dead = set(cards)
+        self.dead |= dead
+        # in place, the list stays the one cards may have handed out
+        self._cards[self._position:] = [card for card in self._cards[self._position:] if card not in dead]
+
     def __str__(self):
-        return Card.print_pretty_cards(self.cards)
+        return Card.print_pretty_cards(self._cards[self._position:])
 
     @staticmethod
     def GetFullDeck():
@@ -39,4 +99,26 @@ class Deck:
             for suit,val in Card.CHAR_SUIT_TO_INT_SUIT.items():
                 Deck._FULL_DECK.append(Card.str_to_int(rank + suit))
 
-        return list(Deck._FULL_DECK)
\ No newline at end of file
+        return list(Deck._FULL_DECK)
+
+    @staticmethod
+    def GetLiveCards(dead):
+        """full deck, in its standard order, without the dead cards"""
+        if not dead:
+            return Deck.GetFullDeck()
+        dead = set(dead)
+        return [card for card in Deck.GetFullDeck() if card not in dead]
+
+    @staticmethod
+    def SampleLiveCards(dead, n_samples, n_cards, rng):
+        """
+        n_samples independent draws of n_cards cards among the live cards (see
+        GetLiveCards), each without replacement, as an int64 array of shape
+        (n_samples, n_cards). Vectorized for Monte Carlo simulations: a draw
+        takes the first cards of a random permutation of the live cards (the
+        argsort of uniform keys), all permutations being generated at once.
+        :param rng: numpy Generator
+        """
+        cards = np.array(Deck.GetLiveCards(dead), dtype=np.int64)
+        order = np.argsort(rng.random((n_samples, len(cards))), axis=1)[:, :n_cards]
+        return cards[order]
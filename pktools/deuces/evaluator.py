@@ -1,4 +1,4 @@
-import itertools
+import numpy as np
 from pktools.deuces.card import Card
 from pktools.deuces.lookup import LookupTable
 
@@ -14,9 +14,11 @@ class Evaluator(object):
     all calculations are done with bit arithmetic and table lookups.
     """
 
-    def __init__(self):
+    _SHARED = None
 
-        self.table = LookupTable()
+    def __init__(self, table=None):
+
+        self.table = table if table is not None else LookupTable.shared()
 
         self.hand_size_map = {
             5: self._five,
@@ -24,6 +26,15 @@ class Evaluator(object):
             7: self._seven
         }
 
+    @staticmethod
+    def shared():
+        """
+        Process wide evaluator, to avoid instantiating one per call site.
+        """
+        if Evaluator._SHARED is None:
+            Evaluator._SHARED = Evaluator()
+        return Evaluator._SHARED
+
     def evaluate(self, cards, board):
         """
         This is the function that the user calls to get a hand rank.
@@ -34,6 +45,34 @@ class Evaluator(object):
         all_cards = cards + board
         return self.hand_size_map[len(all_cards)](all_cards)
 
+    def evaluate_batch(self, hands, boards):
+        """
+        Vectorized evaluate(): ranks N hands at once.
+
+        hands is an integer array of shape (N, 2) and boards an integer
+        array of shape (N, 3), (N, 4) or (N, 5), both of cards in integer
+        form. Returns an (N,) array of ranks in the range [1, 7462].
+
+        Same logic as _seven(), with np.searchsorted on the sorted prime
+        products standing in for the dict lookup.
+        """
+        cards = np.concatenate([np.asarray(hands, dtype=np.int64),
+                                np.asarray(boards, dtype=np.int64)], axis=1)
+
+        product = np.prod(cards & 0xFF, axis=1)
+        suit_counts = self.table.suit_counter_array[(cards >> 12) & 0xF].sum(axis=1)
+        flush_suit = self.table.flush_suit_array[suit_counts]
+
+        suited = np.where(cards & flush_suit[:, None], cards, 0)
+        handOR = np.bitwise_or.reduce(suited, axis=1) >> 16
+        flush_ranks = self.table.flush_best_array[handOR]
+
+        idx = np.searchsorted(self.table.unsuited_keys, product)
+        idx = np.minimum(idx, len(self.table.unsuited_keys) - 1)  # flush rows may miss
+        unsuited_ranks = self.table.unsuited_ranks[idx]
+
+        return np.where(flush_suit != 0, flush_ranks, unsuited_ranks)
+
     def _five(self, cards):
         """
         Performs an evalution given cards in integer form, mapping them to
@@ -55,37 +94,35 @@ class Evaluator(object):
 
     def _six(self, cards):
         """
-        Performs five_card_eval() on all (6 choose 5) = 6 subsets
-        of 5 cards in the set of 6 to determine the best ranking,
-        and returns this ranking.
+        Ranks 6 cards with the same single lookup as 7 cards.
         """
-        minimum = LookupTable.MAX_HIGH_CARD
-
-        all5cardcombobs = itertools.combinations(cards, 5)
-        for combo in all5cardcombobs:
-
-            score = self._five(combo)
-            if score < minimum:
-                minimum = score
-
-        return minimum
+        return self._seven(cards)
 
     def _seven(self, cards):
         """
-        Performs five_card_eval() on all (7 choose 5) = 21 subsets
-        of 5 cards in the set of 7 to determine the best ranking,
-        and returns this ranking.
-        """
-        minimum = LookupTable.MAX_HIGH_CARD
-
-        all5cardcombobs = itertools.combinations(cards, 5)
-        for combo in all5cardcombobs:
-
-            score = self._five(combo)
-            if score < minimum:
-                minimum = score
-
-        return minimum
+        Ranks 6 or 7 cards directly instead of running five_card_eval() on
+        all (7 choose 5) = 21 subsets.
+
+        With 7 cards, a flush rules out four of a kind and full houses, so
+        the best hand is either the best flush among the flush suit's cards
+        or, when there is no flush, the best hand of the rank multiset,
+        which is identified by its prime product.
+        """
+        product = 1
+        suit_counts = 0
+        for c in cards:
+            product *= c & 0xFF
+            suit_counts += LookupTable.SUIT_COUNTER[(c >> 12) & 0xF]
+
+        flush_suit = self.table.flush_suit_lookup[suit_counts]
+        if flush_suit:
+            handOR = 0
+            for c in cards:
+                if c & flush_suit:
+                    handOR |= c
+            return self.table.flush_best_lookup[handOR >> 16]
+
+        return self.table.unsuited_best_lookup[product]
 
     def get_rank_class(self, hr):
         """
@@ -1,4 +1,7 @@
 import itertools
+import os
+import zlib
+import numpy as np
 from pktools.deuces.card import Card
 
 
@@ -47,6 +50,9 @@ class LookupTable(object):
         MAX_HIGH_CARD: 9
     }
 
+    # suit int => increment of that suit's 3 bit count field, see seven_cards()
+    SUIT_COUNTER = [0, 1 << 0, 1 << 3, 0, 1 << 6, 0, 0, 0, 1 << 9]
+
     RANK_CLASS_TO_STRING = {
         1: "Straight Flush",
         2: "Four of a Kind",
@@ -59,7 +65,47 @@ class LookupTable(object):
         9: "High Card"
     }
 
-    def __init__(self):
+    # bump when the content or layout of the saved tables changes
+    FORMAT_VERSION = 2
+    # saved sections, in file order
+    SECTIONS = ('unsuited_keys', 'unsuited_ranks',
+                'flush_keys', 'flush_ranks', 'flush_best_array', 'flush_suit_array',
+                'unsuited_slot_keys', 'unsuited_slot_ranks', 'flush_slot_keys', 'flush_slot_ranks')
+    HEADER_SIZE = 2 + len(SECTIONS)  # version, checksum, section lengths
+    DEFAULT_FILEPATH = os.environ.get(
+        'PKTOOLS_LOOKUP_TABLE',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lookup_table.npy'))
+
+    _SHARED = None
+
+    def __init__(self, filepath=DEFAULT_FILEPATH):
+        """
+        Loads the lookup tables from filepath (memory mapped), or calculates
+        them and saves them there when the file is missing or out of date.
+        With filepath=None, tables are calculated and kept in memory only.
+        """
+        if filepath is not None and self.load(filepath):
+            return
+
+        self.build()
+
+        if filepath is not None:
+            try:
+                self.save(filepath)
+            except OSError:
+                # read only install: keep the in memory tables
+                pass
+
+    @staticmethod
+    def shared():
+        """
+        Process wide table, loaded once and shared by every Evaluator.
+        """
+        if LookupTable._SHARED is None:
+            LookupTable._SHARED = LookupTable()
+        return LookupTable._SHARED
+
+    def build(self):
         """
         Calculates lookup tables
         """
@@ -72,6 +118,12 @@ class LookupTable(object):
         # we reuse some of the bit sequences
         self.multiples()
 
+        # 6 and 7 card tables are derived from the 5 card ones
+        self.seven_cards()
+
+        # array versions of the above, for batch evaluation
+        self.arrays()
+
     def flushes(self):
         """
         Straight flushes and flushes. 
@@ -245,6 +297,138 @@ class LookupTable(object):
                 self.unsuited_lookup[product] = rank
                 rank += 1
 
+    def seven_cards(self):
+        """
+        Best five card rank of 6 and 7 card sets, so that a 7 card hand is
+        ranked with a single lookup instead of 21 five card evaluations.
+
+        - unsuited_best_lookup: 6 or 7 card hand's prime product => best rank
+          ignoring flushes
+        - flush_best_lookup: 13 bit rank pattern of the flush suit's cards
+          (5 to 7 bits set) => best rank, indexed directly
+        - flush_suit_lookup: packed per-suit card counts (see SUIT_COUNTER)
+          => suit bits of the flush suit, or 0 when there is no flush
+
+        Each entry is the best entry among the sets with one card less, so
+        the tables are filled from 5 cards upwards.
+        """
+        self.unsuited_best_lookup = {}
+        previous = self.unsuited_lookup
+        for n_cards in (6, 7):
+            current = {}
+            for ranks in itertools.combinations_with_replacement(Card.INT_RANKS, n_cards):
+                distinct = set(ranks)
+                # no more than 4 cards of a given rank
+                if any(ranks.count(r) > 4 for r in distinct):
+                    continue
+                product = 1
+                for r in ranks:
+                    product *= Card.PRIMES[r]
+                current[product] = min(previous[product // Card.PRIMES[r]] for r in distinct)
+            self.unsuited_best_lookup.update(current)
+            previous = current
+
+        self.flush_best_lookup = [0] * (1 << 13)
+        for n_bits in (5, 6, 7):
+            for ranks in itertools.combinations(Card.INT_RANKS, n_bits):
+                bits = 0
+                for r in ranks:
+                    bits |= 1 << r
+                if n_bits == 5:
+                    best = self.flush_lookup[Card.prime_product_from_rankbits(bits)]
+                else:
+                    best = min(self.flush_best_lookup[bits ^ (1 << r)] for r in ranks)
+                self.flush_best_lookup[bits] = best
+
+        # per-suit counts are packed in 3 bit fields (at most 7 cards)
+        self.flush_suit_lookup = [0] * (1 << 12)
+        for counts in range(1 << 12):
+            for field, suit_int in enumerate((1, 2, 4, 8)):
+                if (counts >> (3 * field)) & 7 >= 5:
+                    self.flush_suit_lookup[counts] = suit_int << 12
+
+    def arrays(self):
+        """
+        NumPy versions of the 5, 6 and 7 card tables, for vectorized lookups:
+
+        - unsuited_keys / unsuited_ranks: every non flush prime product
+          (5 to 7 cards) in sorted order and its best rank, to be searched
+          with np.searchsorted
+        - flush_keys / flush_ranks: content of flush_lookup
+        - flush_best_array, flush_suit_array, suit_counter_array: same
+          content as their list counterparts
+        - unsuited_slot_keys / unsuited_slot_ranks, flush_slot_keys /
+          flush_slot_ranks: the unsuited and flush keys as hash tables (see
+          HashLookup), for the scalar path of a loaded table
+
+        All int64, so that they are saved as a single array.
+        """
+        unsuited = {**self.unsuited_lookup, **self.unsuited_best_lookup}
+        keys = sorted(unsuited)
+        self.unsuited_keys = np.array(keys, dtype=np.int64)
+        self.unsuited_ranks = np.array([unsuited[k] for k in keys], dtype=np.int64)
+        self.flush_keys = np.array(list(self.flush_lookup.keys()), dtype=np.int64)
+        self.flush_ranks = np.array(list(self.flush_lookup.values()), dtype=np.int64)
+        self.flush_best_array = np.array(self.flush_best_lookup, dtype=np.int64)
+        self.flush_suit_array = np.array(self.flush_suit_lookup, dtype=np.int64)
+        self.suit_counter_array = np.array(LookupTable.SUIT_COUNTER, dtype=np.int64)
+        self.unsuited_slot_keys, self.unsuited_slot_ranks = HashLookup.slots(self.unsuited_keys, self.unsuited_ranks)
+        self.flush_slot_keys, self.flush_slot_ranks = HashLookup.slots(self.flush_keys, self.flush_ranks)
+
+    def save(self, filepath):
+        """
+        Writes the array tables to filepath as one int64 .npy file:
+
+            version | checksum | section lengths | sections...
+
+        The file is written aside and renamed, so that concurrent processes
+        never load a partial file.
+        """
+        body = np.concatenate([getattr(self, name) for name in LookupTable.SECTIONS])
+        header = [LookupTable.FORMAT_VERSION, zlib.crc32(body.tobytes())]
+        header += [len(getattr(self, name)) for name in LookupTable.SECTIONS]
+
+        tmp_filepath = '%s.%d.tmp' % (filepath, os.getpid())
+        with open(tmp_filepath, 'wb') as f:
+            np.save(f, np.concatenate([np.array(header, dtype=np.int64), body]))
+        os.replace(tmp_filepath, filepath)
+
+    def load(self, filepath):
+        """
+        Memory maps the tables saved in filepath. Returns False, without
+        loading anything, if the file is missing, from another format version
+        or corrupted.
+        """
+        try:
+            data = np.load(filepath, mmap_mode='r')
+        except (OSError, ValueError):
+            return False
+
+        if data.dtype != np.int64 or data.ndim != 1 or len(data) < LookupTable.HEADER_SIZE:
+            return False
+        header = data[:LookupTable.HEADER_SIZE].tolist()
+        body = data[LookupTable.HEADER_SIZE:]
+        if header[0] != LookupTable.FORMAT_VERSION or sum(header[2:]) != len(body):
+            return False
+        if zlib.crc32(body) != header[1]:
+            return False
+
+        start = 0
+        for name, length in zip(LookupTable.SECTIONS, header[2:]):
+            setattr(self, name, body[start:start + length])
+            start += length
+        self.suit_counter_array = np.array(LookupTable.SUIT_COUNTER, dtype=np.int64)
+
+        # the scalar evaluation path reads the memory maps too (no private copy, so the pages
+        # stay shared between processes). 5 card and 6/7 card prime products never collide
+        # (they don't have as many factors): both unsuited lookups use the same table
+        self.unsuited_lookup = HashLookup(self.unsuited_slot_keys, self.unsuited_slot_ranks)
+        self.unsuited_best_lookup = self.unsuited_lookup
+        self.flush_lookup = HashLookup(self.flush_slot_keys, self.flush_slot_ranks)
+        self.flush_best_lookup = memoryview(self.flush_best_array)
+        self.flush_suit_lookup = memoryview(self.flush_suit_array)
+        return True
+
     def write_table_to_disk(self, table, filepath):
         """
         Writes lookup table to disk
@@ -267,4 +451,57 @@ class LookupTable(object):
         while True:
             t = (next | (next - 1)) + 1
             next = t | ((int((t & -t) / (next & -next)) >> 1) - 1)
-            yield next
\ No newline at end of file
+            yield next
+
+
+class HashLookup(object):
+    """
+    Read only int => int mapping over two int64 arrays of slots (keys, values),
+    e.g. memory mapped: open addressing with linear probing, 0 marking empty
+    slots (prime products are never 0). The arrays are read through
+    memoryviews, whose items are python ints.
+    """
+
+    # Fibonacci hashing: the top bits of key * 2^64 / golden ratio
+    MULTIPLIER = 0x9E3779B97F4A7C15
+    MASK_64 = (1 << 64) - 1
+
+    def __init__(self, slot_keys, slot_values):
+        self.slot_keys = memoryview(slot_keys)
+        self.slot_values = memoryview(slot_values)
+        self.mask = len(slot_keys) - 1
+        self.shift = 64 - self.mask.bit_length()
+
+    @staticmethod
+    def slots(keys, values):
+        """
+        Slot arrays for keys (non zero) and their values: a power of two of
+        at least twice as many slots as keys, so that probes stay short
+        """
+        size = 1 << (2 * len(keys) - 1).bit_length()
+        mask, shift = size - 1, 64 - (size - 1).bit_length()
+        slot_keys = [0] * size
+        slot_values = [0] * size
+        for key, value in zip(np.asarray(keys).tolist(), np.asarray(values).tolist()):
+            i = ((key * HashLookup.MULTIPLIER) & HashLookup.MASK_64) >> shift
+            while slot_keys[i]:
+                i = (i + 1) & mask
+            slot_keys[i] = key
+            slot_values[i] = value
+        return np.array(slot_keys, dtype=np.int64), np.array(slot_values, dtype=np.int64)
+
+    def __getitem__(self, key):
+        slot_keys = self.slot_keys
+        i = ((key * HashLookup.MULTIPLIER) & HashLookup.MASK_64) >> self.shift
+        while slot_keys[i] != key:
+            if not slot_keys[i]:
+                raise KeyError(key)
+            i = (i + 1) & self.mask
+        return self.slot_values[i]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
@@ -0,0 +1,39 @@
+"""
+Suit isomorphism.
+
+Relabeling the suits of a situation (e.g. spades <-> hearts everywhere) does not
+change any equity. canonical_key maps every (hand, board) to the same key as all
+its suit relabelings, so that computations can be shared between them.
+"""
+from pktools.deuces.card import Card
+
+# canonical suits, in the order they are handed out
+_SUIT_INTS = (1, 2, 4, 8)
+
+
+def canonical_key(hand, board):
+    """
+    Canonical form of a situation, cards given in int form.
+
+    Each suit gets a signature (ranks it holds in hand, ranks it holds on the
+    board). Suits are relabeled in signature order, so any two suits that end up
+    interchangeable have the same signature and the order between them is
+    irrelevant. Card order within the hand and within the board is ignored.
+    :return: (hand, board) as sorted tuples of relabeled cards in int form
+    """
+    signatures = {}
+    for suit_int in _SUIT_INTS:
+        signatures[suit_int] = (sorted(Card.get_rank_int(c) for c in hand if Card.get_suit_int(c) == suit_int),
+                                sorted(Card.get_rank_int(c) for c in board if Card.get_suit_int(c) == suit_int))
+    order = sorted(_SUIT_INTS, key=lambda suit_int: signatures[suit_int], reverse=True)
+    relabel = {suit_int: _SUIT_INTS[i] for i, suit_int in enumerate(order)}
+
+    def convert(cards):
+        return tuple(sorted(_with_suit(c, relabel[Card.get_suit_int(c)]) for c in cards))
+
+    return convert(hand), convert(board)
+
+
+def _with_suit(card_int, suit_int):
+    """same card with another suit"""
+    return (card_int & ~0xF000) | (suit_int << 12)
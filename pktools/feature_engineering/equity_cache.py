@@ -0,0 +1,64 @@
+from collections import OrderedDict
+import os
+import pickle
+
+
+class EquityCache:
+    """
+    Bounded LRU cache of equity results, with hit/miss counters.
+
+    When given a filepath, the cache starts from the entries saved there (if any)
+    and save() writes the current entries back.
+    """
+
+    def __init__(self, maxsize=100000, filepath=None):
+        self.maxsize = maxsize
+        self.filepath = filepath
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+        if filepath is not None and os.path.exists(filepath):
+            self.load(filepath)
+
+    def get(self, key):
+        """:return: cached value, or None if key is not in the cache"""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._entries), 'maxsize': self.maxsize}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def save(self, filepath=None):
+        """writes the entries (least recently used first) to filepath, default: the cache's filepath"""
+        filepath = filepath or self.filepath
+        tmp_filepath = '%s.%d.tmp' % (filepath, os.getpid())
+        with open(tmp_filepath, 'wb') as f:
+            pickle.dump(list(self._entries.items()), f)
+        os.replace(tmp_filepath, filepath)
+
+    def load(self, filepath):
+        """adds the entries saved in filepath"""
+        with open(filepath, 'rb') as f:
+            for key, value in pickle.load(f):
+                self.put(key, value)
@@ -0,0 +1,78 @@
+"""
+Multi-core Monte Carlo equity, for large numbers of trials.
+
+Trials are split in one shard per worker of a persistent process pool. Each
+worker loads the lookup tables once (memory mapped, so the pages are shared)
+and each shard has its own random stream spawned from the master seed, so a
+given (seed, n_workers) always gives the same result.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import os
+import numpy as np
+from pktools.deuces.card import Card
+from pktools.deuces.evaluator import Evaluator
+from pktools.feature_engineering.winning_prob import simulate, showdown_equity
+
+# trials simulated at once by a worker, to bound memory use
+CHUNK_SIZE = 50000
+
+_POOL = None
+_POOL_WORKERS = 0
+
+
+def _init_worker():
+    Evaluator.shared()
+
+
+def get_pool(n_workers=None):
+    """
+    Process pool kept alive between calls, created again only when n_workers changes
+    :param n_workers: default: number of CPUs
+    """
+    global _POOL, _POOL_WORKERS
+    n_workers = n_workers or os.cpu_count() or 1
+    if _POOL is None or _POOL_WORKERS != n_workers:
+        shutdown_pool()
+        _POOL = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker)
+        _POOL_WORKERS = n_workers
+    return _POOL
+
+
+def shutdown_pool():
+    global _POOL, _POOL_WORKERS
+    if _POOL is not None:
+        _POOL.shutdown()
+    _POOL = None
+    _POOL_WORKERS = 0
+
+
+def _simulate_shard(hand, board, n_player, n_simul, seed_sequence):
+    """:return: sum of the player's equity over n_simul trials"""
+    rng = np.random.default_rng(seed_sequence)
+    total = 0.
+    for start in range(0, n_simul, CHUNK_SIZE):
+        equity = showdown_equity(*simulate(hand, board, n_player, min(CHUNK_SIZE, n_simul - start), rng))
+        total += equity.sum()
+    return total
+
+
+def estimate_proba_parallel(hand, board, n_player, n_simul=100000, seed=None, n_workers=None):
+    """
+    Same estimate as winning_prob.estimate_proba (Monte Carlo mode), sharded over processes
+    :param hand: player's cards, as strings
+    :param board: community cards, as strings
+    :param seed: master seed, results are reproducible for a given seed and n_workers
+    :param n_workers: number of worker processes (and shards), default: number of CPUs
+    """
+    hand = Card.hand_to_binary(hand)
+    board = Card.hand_to_binary(board)
+
+    pool = get_pool(n_workers)
+    n_shards = _POOL_WORKERS
+    shard_sizes = [n_simul // n_shards + (i < n_simul % n_shards) for i in range(n_shards)]
+    seed_sequences = np.random.SeedSequence(seed).spawn(n_shards)
+
+    futures = [pool.submit(_simulate_shard, hand, board, n_player, size, seed_sequence)
+               for size, seed_sequence in zip(shard_sizes, seed_sequences) if size > 0]
+
+    return sum(future.result() for future in futures) / n_simul
@@ -0,0 +1,97 @@
+"""
+Preflop equity table.
+
+Before the flop, the equity of a hand only depends on its class (169 of them:
+pairs, suited and offsuit hands, e.g. 'AA', 'AKs', 'AKo') and on the number of
+players. The table stores, for every class and 2 to 10 players, the equity
+against random hands (split pots counting as a fraction of a win, like
+winning_prob.estimate_proba).
+
+To regenerate the shipped table:
+
+    python -m pktools.feature_engineering.preflop_equity [n_simul]
+"""
+import os
+import sys
+import numpy as np
+from pktools.deuces.card import Card
+
+TABLE_FILEPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'preflop_equity.csv')
+MIN_PLAYERS = 2
+MAX_PLAYERS = 10
+
+# ranks from the highest, so that classes are named as usual ('AKs', not 'KAs')
+_RANKS = Card.STR_RANKS[::-1]
+HAND_CLASSES = ([r + r for r in _RANKS] +
+                [r1 + r2 + 's' for i, r1 in enumerate(_RANKS) for r2 in _RANKS[i + 1:]] +
+                [r1 + r2 + 'o' for i, r1 in enumerate(_RANKS) for r2 in _RANKS[i + 1:]])
+
+_TABLE = None
+
+
+def hand_class(hand):
+    """
+    Class of a 2 card hand, given as strings or ints
+    :return: e.g. 'AA', 'AKs' or 'AKo'
+    """
+    if type(hand[0]) == str:
+        hand = Card.hand_to_binary(hand)
+    high, low = sorted(hand, key=Card.get_rank_int, reverse=True)
+    ranks = Card.STR_RANKS[Card.get_rank_int(high)] + Card.STR_RANKS[Card.get_rank_int(low)]
+    if ranks[0] == ranks[1]:
+        return ranks
+    return ranks + ('s' if Card.get_suit_int(high) == Card.get_suit_int(low) else 'o')
+
+
+def class_hand(class_name):
+    """a hand (as strings) of the given class"""
+    second_suit = '♠' if class_name.endswith('s') else '❤'
+    return [class_name[0] + '♠', class_name[1] + second_suit]
+
+
+def load_table(filepath=TABLE_FILEPATH):
+    """
+    :return: dict class name => array of equities, indexed by number of players - MIN_PLAYERS
+    """
+    table = {}
+    with open(filepath, encoding='utf8') as f:
+        next(f)  # header
+        for line in f:
+            fields = line.strip().split(',')
+            table[fields[0]] = np.array([float(x) for x in fields[1:]])
+    return table
+
+
+def preflop_equity(hand, n_player):
+    """
+    Equity of hand against n_player - 1 random hands, read from the table
+    (loaded on first use). Returns None when n_player is out of the table's range.
+    """
+    global _TABLE
+    if not MIN_PLAYERS <= n_player <= MAX_PLAYERS:
+        return None
+    if _TABLE is None:
+        _TABLE = load_table()
+    return _TABLE[hand_class(hand)][n_player - MIN_PLAYERS]
+
+
+def generate_table(n_simul=200000, seed=0, filepath=TABLE_FILEPATH):
+    """
+    Computes the table by Monte Carlo, n_simul trials per entry, and writes it to filepath
+    """
+    from pktools.feature_engineering.winning_prob import estimate_proba
+
+    rng = np.random.default_rng(seed)
+    players = range(MIN_PLAYERS, MAX_PLAYERS + 1)
+    with open(filepath, 'w', encoding='utf8') as f:
+        f.write(','.join(['hand'] + [str(n) for n in players]) + '\n')
+        for class_name in HAND_CLASSES:
+            equities = [estimate_proba(class_hand(class_name), [], n, n_simul=n_simul, seed=rng,
+                                       exact=False, preflop_table=False)
+                        for n in players]
+            f.write(','.join([class_name] + ['%.5f' % e for e in equities]) + '\n')
+            print(class_name, ' '.join('%.3f' % e for e in equities))
+
+
+if __name__ == '__main__':
+    generate_table(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,207 @@
+"""
+Range vs range equity.
+
+A range is a weight vector over the 1326 two card combos (COMBOS order), e.g.
+a known hand is a range with a single non zero weight. range_equity computes
+the equity of every player given their ranges, taking card removal into
+account: combos sharing a card with the board or with each other are never
+dealt together.
+"""
+from functools import lru_cache
+from itertools import combinations
+from math import comb
+import numpy as np
+from pktools.deuces.card import Card
+from pktools.deuces.deck import Deck
+from pktools.deuces.evaluator import Evaluator
+from pktools.feature_engineering.preflop_equity import hand_class
+
+N_COMBOS = 1326
+
+# card int => index in 0..51, and back
+DECK = np.array(Deck.GetFullDeck(), dtype=np.int64)
+CARD_INDEX = {card: i for i, card in enumerate(DECK.tolist())}
+
+# every 2 card combo, as card indices, cards in int form and 52 bit card mask
+COMBO_INDICES = np.array(list(combinations(range(len(DECK)), 2)), dtype=np.int64)
+COMBOS = DECK[COMBO_INDICES]
+COMBO_MASKS = (1 << COMBO_INDICES).sum(axis=1)
+
+# trials drawn per rejection sampling round, relative to the trials still needed
+OVERSAMPLING = 1.5
+MAX_SAMPLING_ROUNDS = 100
+
+
+def card_mask(cards):
+    """52 bit mask of cards in int form"""
+    mask = 0
+    for card in cards:
+        mask |= 1 << CARD_INDEX[card]
+    return mask
+
+
+def combo_index(hand):
+    """index in COMBOS of a 2 card hand, given as strings or ints"""
+    if type(hand[0]) == str:
+        hand = Card.hand_to_binary(hand)
+    i, j = sorted(CARD_INDEX[card] for card in hand)
+    # combos (i, j) are listed by i, then j
+    return i * (2 * len(DECK) - i - 1) // 2 + (j - i - 1)
+
+
+def hand_range(hand):
+    """range holding a single hand, given as strings or ints"""
+    weights = np.zeros(N_COMBOS)
+    weights[combo_index(hand)] = 1.
+    return weights
+
+
+def class_range(classes):
+    """
+    Range from hand classes (see preflop_equity.HAND_CLASSES)
+    :param classes: list of class names (weight 1), or dict class name => weight
+    """
+    if not isinstance(classes, dict):
+        classes = {class_name: 1. for class_name in classes}
+    weights = np.zeros(N_COMBOS)
+    for i in range(N_COMBOS):
+        weights[i] = classes.get(hand_class(COMBOS[i].tolist()), 0.)
+    return weights
+
+
+@lru_cache(maxsize=4096)
+def board_structures(board):
+    """
+    Index structures of a board (sorted tuple of cards in int form), cached as
+    they only depend on it:
+    :return: (indices of the combos not blocked by the board, indices of the cards left in the deck)
+    """
+    board_mask = card_mask(board)
+    live_combos = np.nonzero((COMBO_MASKS & board_mask) == 0)[0]
+    deck = np.array([i for i in range(len(DECK)) if not (board_mask >> i) & 1], dtype=np.int64)
+    return live_combos, deck
+
+
+def _live_weights(ranges, live_combos):
+    weights = [np.asarray(weights, dtype=np.float64)[live_combos] for weights in ranges]
+    for player, player_weights in enumerate(weights):
+        if player_weights.sum() <= 0:
+            raise ValueError('range of player %d is empty once the board cards are removed' % player)
+    return weights
+
+
+def _score(board, runouts, combos):
+    """
+    :param runouts: (n, to_draw) board completions
+    :param combos: (n, n_players) combo indices
+    :return: (n, n_players) hand ranks
+    """
+    n_deals, n_players = combos.shape
+    boards = np.concatenate([np.tile(np.array(board, dtype=np.int64), (n_deals, 1)), runouts], axis=1)
+    hands = COMBOS[combos.reshape(-1)]
+    scores = Evaluator.shared().evaluate_batch(hands, np.repeat(boards, n_players, axis=0))
+    return scores.reshape(n_deals, n_players)
+
+
+def _shares(scores):
+    """share of the pot of every player in every deal"""
+    winners = scores == scores.min(axis=1, keepdims=True)
+    return winners / winners.sum(axis=1, keepdims=True)
+
+
+def _sample(board, ranges, n_simul, rng):
+    """
+    Rejection sampling: combos are drawn from each range and the runout uniformly
+    from the deck, and deals where cards collide are discarded, which leaves deals
+    distributed as the product of the weights over card disjoint deals.
+    """
+    live_combos, deck = board_structures(board)
+    weights = _live_weights(ranges, live_combos)
+    cumulative = [np.cumsum(w) / w.sum() for w in weights]
+    to_draw = 5 - len(board)
+
+    runouts, combos = [], []
+    n_accepted = 0
+    for _ in range(MAX_SAMPLING_ROUNDS):
+        n_draw = int((n_simul - n_accepted) * OVERSAMPLING) + 1
+        drawn_combos = np.stack([live_combos[np.minimum(np.searchsorted(c, rng.random(n_draw)), len(c) - 1)]
+                                 for c in cumulative], axis=1)
+        order = np.argsort(rng.random((n_draw, len(deck))), axis=1)[:, :to_draw]
+        drawn_runouts = deck[order]
+
+        runout_masks = (1 << drawn_runouts).sum(axis=1)
+        masks = COMBO_MASKS[drawn_combos]
+        # cards collide iff the masks overlap, i.e. the sum differs from the union
+        union = np.bitwise_or.reduce(masks, axis=1) | runout_masks
+        valid = union == masks.sum(axis=1) + runout_masks
+
+        runouts.append(drawn_runouts[valid])
+        combos.append(drawn_combos[valid])
+        n_accepted += int(valid.sum())
+        if n_accepted >= n_simul:
+            break
+    else:
+        raise ValueError('could not sample card disjoint deals, ranges block each other')
+
+    return DECK[np.concatenate(runouts)[:n_simul]], np.concatenate(combos)[:n_simul]
+
+
+def count_deals(board, ranges):
+    """upper bound of the number of deals _enumerate produces"""
+    live_combos, deck = board_structures(board)
+    n_deals = comb(len(deck), 5 - len(board))
+    for weights in _live_weights(ranges, live_combos):
+        n_deals *= int((weights > 0).sum())
+    return n_deals
+
+
+def _enumerate(board, ranges):
+    """every card disjoint deal with a non zero weight: (runouts, combos, weights)"""
+    live_combos, deck = board_structures(board)
+    to_draw = 5 - len(board)
+
+    runout_indices = deck[np.array(list(combinations(range(len(deck)), to_draw)),
+                                   dtype=np.int64).reshape(comb(len(deck), to_draw), to_draw)]
+    masks = (1 << runout_indices).sum(axis=1)
+    combos = np.zeros((len(masks), 0), dtype=np.int64)
+    deal_weights = np.ones(len(masks))
+
+    for weights in _live_weights(ranges, live_combos):
+        player_combos = live_combos[weights > 0]
+        player_weights = weights[weights > 0]
+        compatible = (masks[:, None] & COMBO_MASKS[player_combos][None, :]) == 0
+        deal_idx, combo_idx = np.nonzero(compatible)
+        runout_indices = runout_indices[deal_idx]
+        combos = np.concatenate([combos[deal_idx], player_combos[combo_idx, None]], axis=1)
+        masks = masks[deal_idx] | COMBO_MASKS[player_combos[combo_idx]]
+        deal_weights = deal_weights[deal_idx] * player_weights[combo_idx]
+
+    if not len(deal_weights):
+        raise ValueError('no card disjoint deal, ranges block each other')
+    return DECK[runout_indices], combos, deal_weights
+
+
+def range_equity(ranges, board, n_simul=10000, seed=None, exact=None):
+    """
+    Equity of each player (split pots counting as a fraction of a win) given their ranges
+    :param ranges: one weight vector of size N_COMBOS per player, e.g.
+                   [hand_range(['A♠', 'K♠']), class_range(['QQ', 'JJ', 'AKs'])]
+    :param board: community cards, as strings
+    :param n_simul: number of Monte Carlo trials
+    :param seed: seed or numpy Generator, for reproducible estimates
+    :param exact: True to enumerate every deal, False to always sample. By default,
+                  deals are enumerated when there are no more of them than n_simul
+    :return: (n_players,) array of equities
+    """
+    board = tuple(sorted(Card.hand_to_binary(board)))
+
+    if exact is None:
+        exact = count_deals(board, ranges) <= n_simul
+
+    if exact:
+        runouts, combos, weights = _enumerate(board, ranges)
+        return np.average(_shares(_score(board, runouts, combos)), axis=0, weights=weights)
+
+    runouts, combos = _sample(board, ranges, n_simul, np.random.default_rng(seed))
+    return _shares(_score(board, runouts, combos)).mean(axis=0)
+
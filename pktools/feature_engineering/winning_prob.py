@@ -1,44 +1,209 @@
-
-from copy import deepcopy
+from itertools import combinations
+from math import comb, sqrt
+from statistics import NormalDist
+import time
+import numpy as np
 from pktools.deuces.evaluator import Evaluator
 from pktools.deuces.deck import Deck
 from pktools.deuces.card import Card
-from numpy import mean
-from random import shuffle
+from pktools.feature_engineering.preflop_equity import preflop_equity
+from pktools.feature_engineering.canonical import canonical_key
+from pktools.feature_engineering.equity_cache import EquityCache
+
+# estimate_proba results, shared by every situation equal up to a suit relabeling
+EQUITY_CACHE = EquityCache(maxsize=100000)
 
 def set_deck(hand, board):
-    deck = Deck()
-    deck.cards = list( set(deck.cards)-set(hand)-set(board) )
-    return deck
+    return Deck(dead=list(hand) + list(board))
 
-def estimate_proba(hand, board, n_player, n_simul=1000):
+def remaining_cards(hand, board):
+    """array of the cards (int form) that are neither in hand nor on board"""
+    return np.array(Deck.GetLiveCards(list(hand) + list(board)), dtype=np.int64)
 
-    hand = Card.str_to_int(hand)
-    board = Card.str_to_int(board)
+def score_deals(hand, board, drawn, n_opponents):
+    """
+    Scores deals given as an (n_deals, to_draw + 2 * n_opponents) array of cards:
+    the rest of the board, then the opponents' hands.
+    :return: (score of the player (n_deals,), scores of the opponents (n_deals, n_opponents))
+    """
+    evaluator = Evaluator.shared()
+    n_deals = len(drawn)
+    to_draw = 5 - len(board)
 
-    evaluator = Evaluator()
-    to_draw = 5-len(board)
-    deck = set_deck(hand, board)
+    boards = np.concatenate([np.tile(np.array(board, dtype=np.int64), (n_deals, 1)),
+                             drawn[:, :to_draw]], axis=1)
+    other_hands = drawn[:, to_draw:].reshape(n_deals * n_opponents, 2)
 
-    winnings = []
+    score_player = evaluator.evaluate_batch(np.tile(np.array(hand, dtype=np.int64), (n_deals, 1)), boards)
+    score_others = evaluator.evaluate_batch(other_hands, np.repeat(boards, n_opponents, axis=0))
 
-    for _ in range(n_simul):
-        deck2 = deepcopy(deck)
-        shuffle(deck2.cards)
-        if to_draw == 1:
-            board2 = board + [deck2.draw(to_draw)]
-        else:
-            board2 = board + deck2.draw(to_draw)
-        if n_player > 2:
-            other_hands = list(zip(deck2.draw(n_player-1), deck2.draw(n_player-1)))
-            score_others = min([evaluator.evaluate(list(hand2), board2) for hand2 in other_hands])
-        elif n_player == 2:
-            other_hand = deck2.draw(2)
-            score_others = evaluator.evaluate(other_hand,board2)
+    return score_player, score_others.reshape(n_deals, n_opponents)
+
+def showdown_equity(score_player, score_others):
+    """
+    Share of the pot won by the player in each deal: 1 for a win, 0 for a loss
+    and 1 / number of winners for a split pot
+    """
+    best_other = score_others.min(axis=1)
+    n_tied = (score_others == score_player[:, None]).sum(axis=1)
+    return np.where(score_player < best_other, 1.,
+                    np.where(score_player == best_other, 1. / (1 + n_tied), 0.))
+
+def simulate(hand, board, n_player, n_simul, rng):
+    """
+    Plays n_simul random runouts at once, all cards in int form.
+
+    Each trial draws, without replacement from the remaining cards, the rest
+    of the board and the opponents' hands (see Deck.SampleLiveCards).
+    """
+    n_opponents = n_player - 1
+    drawn = Deck.SampleLiveCards(list(hand) + list(board), n_simul, 5 - len(board) + 2 * n_opponents, rng)
+
+    return score_deals(hand, board, drawn, n_opponents)
+
+def count_deals(n_cards, to_draw, n_opponents):
+    """number of deals enumerate_deals would produce"""
+    n_deals = comb(n_cards, to_draw)
+    for i in range(n_opponents):
+        n_deals *= comb(n_cards - to_draw - 2 * i, 2)
+    return n_deals
+
+def enumerate_deals(n_cards, to_draw, n_opponents):
+    """
+    Every deal of to_draw board cards, then a hand per opponent, among n_cards cards.
+    Opponents are distinct seats, so the same hands in a different order are
+    different deals (all deals stay equally likely).
+    :return: (n_deals, to_draw + 2 * n_opponents) array of indices in the n_cards
+    """
+    deals = np.array(list(combinations(range(n_cards), to_draw)), dtype=np.int64)
+    deals = deals.reshape(comb(n_cards, to_draw), to_draw)  # keeps 2 dims when to_draw == 0
+    pairs = np.array(list(combinations(range(n_cards), 2)), dtype=np.int64)
+    pair_masks = (1 << pairs).sum(axis=1)
+
+    for _ in range(n_opponents):
+        deal_masks = (1 << deals).sum(axis=1)
+        compatible = (deal_masks[:, None] & pair_masks[None, :]) == 0
+        deal_idx, pair_idx = np.nonzero(compatible)
+        deals = np.concatenate([deals[deal_idx], pairs[pair_idx]], axis=1)
+
+    return deals
+
+def enumerate_showdowns(hand, board, n_player):
+    """Scores every possible runout and opponents' hands, all cards in int form"""
+    n_opponents = n_player - 1
+    deck = remaining_cards(hand, board)
+    return score_deals(hand, board, deck[enumerate_deals(len(deck), 5 - len(board), n_opponents)], n_opponents)
 
-        score_player = evaluator.evaluate(hand, board2)
+def estimate_proba(hand, board, n_player, n_simul=1000, seed=None, exact=None, preflop_table=True,
+                   cache=EQUITY_CACHE):
+    """
+    Estimates the equity of hand against n_player - 1 random hands, split pots
+    counting as a fraction of a win
+    :param hand: player's cards, as strings
+    :param board: community cards, as strings
+    :param n_simul: number of Monte Carlo trials
+    :param seed: seed or numpy Generator, for reproducible estimates
+    :param exact: True to enumerate every deal instead of sampling, False to
+                  always sample. By default, deals are enumerated when there are
+                  no more of them than n_simul (typically on the turn and river)
+    :param preflop_table: with an empty board, read the equity from the precomputed
+                          preflop table (2 to 10 players) instead of simulating
+    :param cache: EquityCache to consult (None to disable), keyed on the suit
+                  isomorphic form of the situation. Not used when a seed is given,
+                  so that seeded results do not depend on previous calls
+    """
+    if preflop_table and not board and exact is None:
+        equity = preflop_equity(hand, n_player)
+        if equity is not None:
+            return equity
+
+    hand = Card.hand_to_binary(hand)
+    board = Card.hand_to_binary(board)
+
+    if exact is None:
+        exact = count_deals(52 - len(hand) - len(board), 5 - len(board), n_player - 1) <= n_simul
+
+    if cache is not None and seed is None:
+        key = (canonical_key(hand, board), n_player, None if exact else n_simul)
+        equity = cache.get(key)
+        if equity is None:
+            equity = compute_equity(hand, board, n_player, n_simul, None, exact)
+            cache.put(key, equity)
+        return equity
+
+    return compute_equity(hand, board, n_player, n_simul, seed, exact)
+
+def compute_equity(hand, board, n_player, n_simul, seed, exact):
+    """estimate_proba computation, cards in int form"""
+    if exact:
+        score_player, score_others = enumerate_showdowns(hand, board, n_player)
+    else:
+        rng = np.random.default_rng(seed)
+        score_player, score_others = simulate(hand, board, n_player, n_simul, rng)
+
+    return np.mean(showdown_equity(score_player, score_others))
+
+def estimate_proba_sequential(hand, board, n_player, tolerance=0.01, time_budget=None, confidence=0.95,
+                              batch_size=250, min_simul=250, max_simul=100000, seed=None):
+    """
+    Estimates the same equity as estimate_proba, simulating by batches until the
+    confidence interval is narrow enough, so that clear cut situations cost few trials.
+
+    Stops as soon as one of these is reached (but not before min_simul trials):
+    - the half-width of the confidence interval is below tolerance
+    - time_budget seconds have elapsed (checked after each batch)
+    - max_simul trials have been played
+    Situations with no more deals than max_simul are enumerated instead, by batches of
+    deals taken in a random order: stopped early, the deals are a sample without
+    replacement, and once they are all played the equity is exact (standard error 0).
+    :param confidence: confidence level of the interval (normal approximation with
+                       z^2 / 2 pseudo wins and losses, as in the Agresti-Coull interval,
+                       so that a run of identical outcomes doesn't give a zero width)
+    :return: (estimated equity, standard error of the estimate)
+    """
+    start = time.perf_counter()
+    hand = Card.hand_to_binary(hand)
+    board = Card.hand_to_binary(board)
+    n_opponents = n_player - 1
+    rng = np.random.default_rng(seed)
+
+    population = count_deals(52 - len(hand) - len(board), 5 - len(board), n_opponents)
+    if population <= max_simul:
+        deck = remaining_cards(hand, board)
+        deals = deck[enumerate_deals(len(deck), 5 - len(board), n_opponents)]
+        order = rng.permutation(population)
+        max_simul = population
+    else:
+        population = None
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    n_simul, total, total_sq = 0, 0., 0.
+
+    while n_simul < max_simul:
+        size = min(batch_size, max_simul - n_simul)
+        if population is not None:
+            scores = score_deals(hand, board, deals[order[n_simul:n_simul + size]], n_opponents)
+        else:
+            scores = simulate(hand, board, n_player, size, rng)
+        equity = showdown_equity(*scores)
+        n_simul += len(equity)
+        total += equity.sum()
+        total_sq += (equity ** 2).sum()
 
-        winnings += [score_player < score_others]
+        mean = total / n_simul
+        n_adjusted = n_simul + z ** 2
+        mean_adjusted = (total + z ** 2 / 2) / n_adjusted
+        variance = max((total_sq + z ** 2 / 2) / n_adjusted - mean_adjusted ** 2, 0.)
+        standard_error = sqrt(variance / n_adjusted)
+        if population is not None:
+            # finite population correction: 0 once every deal is played
+            standard_error *= sqrt((population - n_simul) / max(population - 1, 1))
 
-    return mean(winnings)
+        if n_simul < min_simul:
+            continue
+        if z * standard_error <= tolerance:
+            break
+        if time_budget is not None and time.perf_counter() - start >= time_budget:
+            break
 
+    return mean, standard_error
@@ -0,0 +1,71 @@
+"""
+Parity of the single lookup 6 and 7 card ranking (Evaluator._six/_seven and
+evaluate_batch) with the best of the 5 card subsets.
+
+Run from the repository root: python -m unittest discover tests
+"""
+from itertools import combinations
+import random
+import unittest
+import numpy as np
+from pktools.deuces.deck import Deck
+from pktools.deuces.evaluator import Evaluator
+
+N_HANDS = 3000
+
+
+def random_hands(rng, n_cards, n_hands):
+    """n_hands hands of n_cards distinct cards, one in three forced to hold 5 cards or more of one suit"""
+    full_deck = Deck.GetFullDeck()
+    hands = []
+    for i in range(n_hands):
+        if i % 3 == 0:
+            suit = rng.choice((1, 2, 4, 8)) << 12
+            suited = [card for card in full_deck if card & suit]
+            n_suited = rng.randint(5, n_cards)
+            cards = rng.sample(suited, n_suited)
+            cards += rng.sample([card for card in full_deck if card not in cards], n_cards - n_suited)
+            rng.shuffle(cards)
+        else:
+            cards = rng.sample(full_deck, n_cards)
+        hands.append(cards)
+    return hands
+
+
+class EvaluatorParityTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.evaluator = Evaluator()
+
+    def best_five(self, cards):
+        return min(self.evaluator._five(list(five)) for five in combinations(cards, 5))
+
+    def test_evaluate(self):
+        rng = random.Random(0)
+        for n_cards in (5, 6, 7):
+            for cards in random_hands(rng, n_cards, N_HANDS):
+                self.assertEqual(self.evaluator.evaluate(cards[:2], cards[2:]), self.best_five(cards), cards)
+
+    def test_evaluate_batch(self):
+        rng = random.Random(1)
+        for n_cards in (5, 6, 7):
+            cards = random_hands(rng, n_cards, N_HANDS)
+            ranks = self.evaluator.evaluate_batch(np.array(cards)[:, :2], np.array(cards)[:, 2:])
+            self.assertEqual(ranks.tolist(), [self.best_five(hand) for hand in cards])
+
+    def test_forced_flushes(self):
+        # every flush suit, with 5, 6 and 7 cards of that suit
+        rng = random.Random(2)
+        full_deck = Deck.GetFullDeck()
+        for suit in (1, 2, 4, 8):
+            suited = [card for card in full_deck if card & (suit << 12)]
+            others = [card for card in full_deck if not card & (suit << 12)]
+            for n_suited in (5, 6, 7):
+                for _ in range(200):
+                    cards = rng.sample(suited, n_suited) + rng.sample(others, 7 - n_suited)
+                    self.assertEqual(self.evaluator.evaluate(cards[:2], cards[2:]), self.best_five(cards), cards)
+
+
+if __name__ == '__main__':
+    unittest.main()
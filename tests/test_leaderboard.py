@@ -0,0 +1,42 @@
+"""
+Leaderboard statistics of a game: rounds of busting seats, models seated twice.
+
+Run from the repository root: python -m unittest discover tests
+"""
+import unittest
+from tournament.leaderboard import Leaderboard
+
+
+def make_game(player_models, rounds, chip_deltas):
+    """game log with the fields read by Leaderboard.add_game"""
+    return {'n_players': len(player_models), 'initial stack': 1000,
+            'player_models': {'player_%d' % seat: model for seat, model in enumerate(player_models)},
+            'game_history': [{'players_in': players_in, 'winner': winner} for players_in, winner in rounds],
+            'summary': {'chip_deltas': {'player_%d' % seat: delta for seat, delta in enumerate(chip_deltas)}}}
+
+
+class LeaderboardTest(unittest.TestCase):
+
+    def test_bust_round_counted(self):
+        # seat 0 busts in the second round: it is no longer in players_in, but was dealt in
+        game = make_game(['a', 'b', 'c'], [([0, 1, 2], [0]), ([1, 2], [1]), ([1, 2], [2])], [-1000, 500, 500])
+        leaderboard = Leaderboard(None)
+        leaderboard.add_game(game)
+        self.assertEqual(leaderboard.models['a']['rounds'], 2)
+        self.assertEqual(leaderboard.models['a']['rounds_won'], 1)
+        self.assertEqual(leaderboard.models['b']['rounds'], 3)
+
+    def test_model_seated_twice(self):
+        game = make_game(['a', 'b', 'a'], [([0, 1, 2], [1])], [-10, 30, -20])
+        leaderboard = Leaderboard(None)
+        leaderboard.add_game(game)
+        a, b = leaderboard.models['a'], leaderboard.models['b']
+        self.assertEqual((a['games'], b['games']), (1, 1))
+        self.assertEqual((a['chip_delta'], a['rounds']), (-30, 2))
+        # a single update of ELO_K / 2 each way
+        self.assertAlmostEqual(a['rating'], Leaderboard.ELO_START - Leaderboard.ELO_K / 2)
+        self.assertAlmostEqual(b['rating'], Leaderboard.ELO_START + Leaderboard.ELO_K / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
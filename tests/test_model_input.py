@@ -0,0 +1,62 @@
+"""
+Models written for the former plain dict input still play with the lazy input.
+
+Run from the repository root: python -m unittest discover tests
+"""
+import json
+from os.path import join
+import tempfile
+import unittest
+from tournament.poker_game import Game
+
+
+class ModelInputTest(unittest.TestCase):
+
+    def play(self, make_decision, n_rounds=3):
+        """plays make_decision against itself, returns the actions taken"""
+        with tempfile.TemporaryDirectory() as log_dir:
+            game = Game(join(log_dir, 'game.jsonl'), [make_decision, make_decision], rng=0)
+            game.play_game(n_rounds)
+        return [action['last_action'] for round_info in game.game_logger
+                for turn in round_info['round_history'] for action in turn]
+
+    def test_plain_values(self):
+        decisions = []
+
+        def make_decision(input):
+            cards = input['hand'] + input['community']
+            cards.append(input['hand ints'][0])
+            others = json.dumps(input['others info'])
+            self.assertIsInstance(input['others info'], list)
+            self.assertIsInstance(input['player info'], dict)
+            decisions.append((cards, others))
+            return 'call'
+
+        actions = self.play(make_decision)
+        self.assertTrue(decisions)
+        self.assertNotIn('timeout', actions)
+
+    def test_history_concatenation(self):
+        def make_decision(input):
+            history = input['game history'] + input['game history']
+            if not isinstance(history, list) or len(history) != 2 * len(input['game history']):
+                raise ValueError(history)
+            return 'call'
+
+        self.assertNotIn('timeout', self.play(make_decision))
+
+    def test_input_doesnt_modify_game(self):
+        def make_decision(input):
+            input['hand'].append('A♠')
+            input['others info'][0]['stack'] = 0
+            return 'call'
+
+        with tempfile.TemporaryDirectory() as log_dir:
+            game = Game(join(log_dir, 'game.jsonl'), [make_decision, make_decision], rng=0)
+            game.play_game(1)
+        self.assertTrue(all(len(player.hand) == 2 for player in game.players))
+        self.assertTrue(all(info['stack'] > 0 for info in game.players_info))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+"""
+Games played without a log.
+
+Run from the repository root: python -m unittest discover tests
+"""
+import os
+import tempfile
+import unittest
+from tournament.poker_game import Game
+
+
+def make_decision(input):
+    return 'call'
+
+
+class GameLogTest(unittest.TestCase):
+
+    def test_no_log(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            cwd = os.getcwd()
+            os.chdir(work_dir)
+            try:
+                game = Game(None, [make_decision, make_decision], rng=0)
+                game.play_game(5)
+            finally:
+                os.chdir(cwd)
+            self.assertEqual(os.listdir(work_dir), [])
+        self.assertEqual(game.round_nb, len(game.game_logger))
+        self.assertEqual(sum(player.stack for player in game.players), 2 * game.initial_stack)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,414 @@
+"""
+Bots: models running as separate local executables.
+
+A bot reads messages on its stdin and answers on its stdout, one JSON object
+per line. The engine starts it once and keeps it for many decisions, so that a
+heavy bot pays its startup only once. Messages sent by the engine:
+
+hello    {"type": "hello", "protocol": 1}
+         the bot answers {"type": "hello", "protocol": 1, "name": ..., "batch": true or false}
+         ("batch": it accepts batch messages)
+decide   {"type": "decide", "game": ..., "history_start": ..., "new_history": [...], "input": {...}}
+         the bot answers {"type": "decision", "decision": ...} or {"type": "decision", "error": "..."}
+batch    {"type": "batch", "requests": [decide messages without "type"]}, e.g. for several tables
+         the bot answers {"type": "batch", "replies": [{"decision": ...} or {"error": "..."}, ...]}
+         in the order of the requests
+end      {"type": "end", "game": ...}, the game is over (no answer)
+bye      {"type": "bye"}, the bot must exit (no answer)
+
+input is the model's input without its game history. As the game history only
+grows during a game, the bot keeps it for each game: a request carries the
+entries from history_start on, the entries before are the ones already sent.
+
+On the engine side, a BotPool keeps a few connections to a bot and batches the
+requests waiting for a connection. On the bot side, serve(make_decision) runs
+the protocol for a python make_decision function.
+"""
+import asyncio
+from collections import deque
+import inspect
+import itertools
+import json
+import os
+import selectors
+import shlex
+import subprocess
+import sys
+import threading
+import time
+import yaml
+from tournament.model_input import to_plain
+
+PROTOCOL_VERSION = 1
+
+# connection taken from a pool but not started yet
+_NEW = object()
+
+
+def _encode(message):
+    # numpy scalars (e.g. stacks) are written as numbers
+    return (json.dumps(message, default=lambda value: value.item()) + '\n').encode('utf8')
+
+
+class BotConnection:
+    """One running bot process"""
+
+    def __init__(self, command, cwd=None, startup_timeout=30):
+        """
+        Starts the bot and checks its handshake
+        :param command: list of the program and its arguments
+        :param startup_timeout: seconds allowed to the bot to answer the hello message
+        """
+        self.process = subprocess.Popen(command, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.process.stdout, selectors.EVENT_READ)
+        self.buffer = b''
+        self.history_sent = {} # number of game history entries the bot has, by game
+
+        self.send({'type': 'hello', 'protocol': PROTOCOL_VERSION})
+        reply = self.receive(startup_timeout)
+        if reply.get('type') != 'hello' or reply.get('protocol') != PROTOCOL_VERSION:
+            self.kill()
+            raise RuntimeError('bot %s: unexpected handshake %s' % (command, reply))
+        self.name = reply.get('name')
+        self.batch = bool(reply.get('batch', False))
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def send(self, message):
+        try:
+            self.process.stdin.write(_encode(message))
+        except OSError:
+            raise RuntimeError('bot exited')
+
+    def receive(self, time_delay):
+        """
+        Next message of the bot
+        :raise TimeoutError: no complete message within time_delay seconds
+        :raise RuntimeError: the bot exited or its message is not valid JSON
+        """
+        deadline = time.monotonic() + time_delay
+        while b'\n' not in self.buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.selector.select(remaining):
+                raise TimeoutError('bot timeout [%s seconds] exceeded!' % time_delay)
+            data = os.read(self.process.stdout.fileno(), 65536)
+            if not data:
+                raise RuntimeError('bot exited')
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        try:
+            return json.loads(line)
+        except ValueError:
+            raise RuntimeError('bot sent an invalid message: %r' % line[:200])
+
+    def forget(self, games):
+        """tells the bot that games are over"""
+        for game in games & self.history_sent.keys():
+            del self.history_sent[game]
+            self.send({'type': 'end', 'game': game})
+
+    def __request(self, game, input):
+        history = input['game history']
+        start = self.history_sent.get(game, 0)
+        self.history_sent[game] = len(history)
+        return {'game': game,
+                'history_start': start,
+                'new_history': [to_plain(entry) for entry in history[start:]],
+                'input': {key: to_plain(input[key]) for key in input if key != 'game history'}}
+
+    def decide(self, requests, time_delay):
+        """
+        Decisions of the bot for a list of (game, input), in one message if there are several
+        :return: list of {"decision": ...} or {"error": "..."}
+        """
+        if len(requests) == 1:
+            self.send({'type': 'decide', **self.__request(*requests[0])})
+            reply = self.receive(time_delay)
+            if reply.get('type') != 'decision':
+                raise RuntimeError('bot sent %s instead of a decision' % reply.get('type'))
+            return [reply]
+
+        self.send({'type': 'batch', 'requests': [self.__request(game, input) for game, input in requests]})
+        reply = self.receive(time_delay)
+        if reply.get('type') != 'batch' or len(reply.get('replies', ())) != len(requests):
+            raise RuntimeError('bot sent an invalid reply to a batch of %d requests' % len(requests))
+        return reply['replies']
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+        self.selector.close()
+        self.process.stdin.close()
+        self.process.stdout.close()
+
+    def close(self):
+        """asks the bot to exit, kills it if it doesn't"""
+        try:
+            self.send({'type': 'bye'})
+            self.process.wait(1)
+        except (RuntimeError, subprocess.TimeoutExpired):
+            pass
+        self.kill()
+
+
+class _Request:
+    __slots__ = ('game', 'input', 'deadline', 'done', 'reply')
+
+    def __init__(self, game, input, deadline):
+        self.game = game
+        self.input = input
+        self.deadline = deadline # time.monotonic() by which the decision is due
+        self.done = False
+        self.reply = None
+
+
+class BotPool:
+    """
+    Connections to a bot, shared by every game of the process (it is thread safe, for the
+    asyncio engine). A request that finds every connection busy waits in a queue, and the next
+    connection freed takes up to max_batch queued requests at once if the bot accepts batches.
+
+    Each request has its own deadline, counted from when it is made (time spent in the queue
+    included). A batch is only as large as the bot can answer before the deadline of its first
+    (oldest) request, judging from the time per decision of the previous batches: until one is
+    measured, requests are sent alone. The reply to a batch is awaited until its last deadline,
+    and only the requests whose own deadline has passed by then are timeouts. A request still
+    in the queue at its deadline is not sent.
+    """
+
+    def __init__(self, command, name=None, size=1, cwd=None, max_batch=16, startup_timeout=30):
+        """
+        :param command: program and arguments, as a list or a string. A leading 'python' is the
+                        engine's python interpreter
+        :param size: maximum number of connections (bot processes)
+        :param cwd: directory the bot is run in
+        """
+        if isinstance(command, str):
+            command = shlex.split(command)
+        if command[0] == 'python':
+            command = [sys.executable] + command[1:]
+        self.command = command
+        self.name = name if name is not None else os.path.basename(command[-1])
+        self.size = size
+        self.cwd = cwd
+        self.max_batch = max_batch
+        self.startup_timeout = startup_timeout
+
+        self.__condition = threading.Condition()
+        self.__idle = []
+        self.__n_connections = 0
+        self.__pending = deque()
+        self.__games = itertools.count()
+        self.__ended = set()
+        self.__decision_time = None # seconds per decision of the bot, from the previous batches
+
+    @staticmethod
+    def from_file(file, name=None):
+        """
+        Pool described by a bot.yaml file: command, and optionally connections and max_batch.
+        The bot runs in the directory of the file
+        """
+        with open(file, encoding='utf8') as infile:
+            config = yaml.safe_load(infile)
+        return BotPool(config['command'], name=name, size=config.get('connections', 1),
+                       cwd=os.path.dirname(os.path.abspath(file)), max_batch=config.get('max_batch', 16))
+
+    def session(self):
+        """worker for the player of one game (see Player): fed with the game's inputs only"""
+        return BotSession(self, next(self.__games))
+
+    def __take_connection(self):
+        """an idle connection, or _NEW (started outside of the lock), or None if the pool is full"""
+        while self.__idle:
+            connection = self.__idle.pop()
+            if connection.alive():
+                return connection
+            connection.kill()
+            self.__n_connections -= 1
+        if self.__n_connections < self.size:
+            self.__n_connections += 1
+            return _NEW
+        return None
+
+    def decide(self, game, input, time_delay):
+        """
+        Decision of the bot for input, from the game number game
+        :raise TimeoutError: the bot didn't answer within time_delay seconds (time waiting for a
+                             connection included). If the bot is still thinking, its connection is killed
+        :raise RuntimeError: the bot failed on this input or broke the protocol
+        """
+        request = _Request(game, input, time.monotonic() + time_delay)
+        with self.__condition:
+            self.__pending.append(request)
+
+        while True:
+            with self.__condition:
+                connection = None
+                while not request.done:
+                    if self.__pending:
+                        connection = self.__take_connection()
+                        if connection is not None:
+                            break
+                    self.__condition.wait()
+                if request.done:
+                    break
+                batch, expired = self.__take_batch(connection is _NEW or connection.batch)
+                for expired_request in expired:
+                    expired_request.reply = self.__timeout()
+                    expired_request.done = True
+                if expired:
+                    self.__condition.notify_all()
+                if not batch:
+                    # every queued request had expired: the connection is given back
+                    if connection is _NEW:
+                        self.__n_connections -= 1
+                    else:
+                        self.__idle.append(connection)
+                    continue
+                ended = set(self.__ended)
+            self.__serve(connection, batch, ended)
+
+        if isinstance(request.reply, Exception):
+            raise request.reply
+        if 'error' in request.reply:
+            raise RuntimeError('bot [%s] raised %s' % (self.name, request.reply['error']))
+        return request.reply['decision']
+
+    def __take_batch(self, batch):
+        """
+        (requests to send, requests whose deadline passed in the queue), taken from the queue.
+        A batch holds the requests the bot can answer before the first one's deadline
+        :param batch: the connection accepts batches
+        """
+        now = time.monotonic()
+        expired = []
+        while self.__pending and self.__pending[0].deadline <= now:
+            expired.append(self.__pending.popleft())
+        if not self.__pending:
+            return [], expired
+
+        batch_size = 1
+        if batch and self.__decision_time is not None:
+            fitting = (self.__pending[0].deadline - now) / max(self.__decision_time, 1e-6)
+            batch_size = max(1, min(self.max_batch, len(self.__pending), int(fitting)))
+        return [self.__pending.popleft() for _ in range(batch_size)], expired
+
+    def __serve(self, connection, batch, ended):
+        sent, replies = [], []
+        try:
+            if connection is _NEW:
+                connection = BotConnection(self.command, self.cwd, self.startup_timeout)
+                if not connection.batch and len(batch) > 1:
+                    # the bot turned out not to accept batches: the extra requests wait for their turn
+                    with self.__condition:
+                        self.__pending.extendleft(reversed(batch[1:]))
+                    batch = batch[:1]
+            connection.forget(ended)
+            # the bot's start may have used up the time of some requests: they are not sent
+            start = time.monotonic()
+            sent = [request for request in batch if request.deadline > start]
+            if sent:
+                time_delay = max(request.deadline for request in sent) - start
+                replies = connection.decide([(request.game, request.input) for request in sent], time_delay)
+                answered = time.monotonic()
+                # late replies are timeouts, but the bot is fine: the connection is kept
+                replies = [self.__timeout() if answered > request.deadline else reply
+                           for request, reply in zip(sent, replies)]
+        except Exception as e:
+            # the state of the bot is unknown: the connection is dropped
+            if isinstance(connection, BotConnection):
+                connection.kill()
+            connection = None
+            sent, replies = batch, [e] * len(batch)
+
+        with self.__condition:
+            if connection is not None and sent:
+                decision_time = (answered - start) / len(sent)
+                self.__decision_time = decision_time if self.__decision_time is None \
+                    else 0.8 * self.__decision_time + 0.2 * decision_time
+            outcomes = dict(zip(map(id, sent), replies))
+            for request in batch:
+                request.reply = outcomes[id(request)] if id(request) in outcomes else self.__timeout()
+                request.done = True
+            if connection is not None and connection.alive():
+                self.__idle.append(connection)
+            else:
+                self.__n_connections -= 1
+            self.__condition.notify_all()
+
+    def __timeout(self):
+        return TimeoutError('bot [%s] timeout exceeded' % self.name)
+
+    def end_game(self, game):
+        with self.__condition:
+            self.__ended.add(game)
+
+    def close(self):
+        """stops the idle bots"""
+        with self.__condition:
+            idle, self.__idle = self.__idle, []
+            self.__n_connections -= len(idle)
+        for connection in idle:
+            connection.close()
+
+
+class BotSession:
+    """Worker of a player using a bot, with the interface of ModelWorker"""
+
+    def __init__(self, pool, game):
+        self.pool = pool
+        self.game = game
+
+    def __call__(self, input, time_delay):
+        return self.pool.decide(self.game, input, time_delay)
+
+    def close(self):
+        self.pool.end_game(self.game)
+
+
+def serve(make_decision, name=None, stdin=None, stdout=None):
+    """
+    Runs the bot side of the protocol until the engine says bye or closes stdin.
+    make_decision gets the same input as an in-process model, as a plain dict (it can be
+    a coroutine function). While it runs, sys.stdout is the bot's stderr, so that prints
+    don't break the protocol.
+    """
+    stdin = stdin if stdin is not None else sys.stdin.buffer
+    stdout = stdout if stdout is not None else sys.stdout.buffer
+    sys.stdout = sys.stderr
+    histories = {}
+
+    def decide(request):
+        history = histories.setdefault(request['game'], [])
+        del history[request['history_start']:]
+        history += request['new_history']
+        input = request['input']
+        input['game history'] = history
+        try:
+            decision = make_decision(input)
+            if inspect.iscoroutine(decision):
+                decision = asyncio.run(decision)
+            return {'decision': decision}
+        except Exception as e:
+            return {'error': repr(e)}
+
+    for line in stdin:
+        message = json.loads(line)
+        if message['type'] == 'hello':
+            reply = {'type': 'hello', 'protocol': PROTOCOL_VERSION,
+                     'name': name if name is not None else make_decision.__module__, 'batch': True}
+        elif message['type'] == 'decide':
+            reply = {'type': 'decision', **decide(message)}
+        elif message['type'] == 'batch':
+            reply = {'type': 'batch', 'replies': [decide(request) for request in message['requests']]}
+        elif message['type'] == 'end':
+            histories.pop(message['game'], None)
+            continue
+        elif message['type'] == 'bye':
+            return
+        else:
+            reply = {'type': 'error', 'error': 'unknown message type %s' % message['type']}
+        stdout.write(_encode(reply))
+        stdout.flush()
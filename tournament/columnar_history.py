@@ -0,0 +1,192 @@
+"""
+Columnar hand history.
+
+Text logs are slow to parse when analyzing many tournaments. This format keeps
+each kind of row in a typed NumPy structured array, saved as a .npy file that
+is memory-mapped when read: nothing is parsed.
+
+A history is a directory of chunks (chunk_000000, chunk_000001...), each chunk
+being written at once by export_games and holding the tables:
+
+games     one row per game, with the settings and the row ranges of the game in
+          the other tables of its chunk (the index)
+seats     game, seat, model name
+rounds    one row per round: community cards, winners (bit mask of the seats) and
+          the row ranges of the round in the players and actions tables
+players   one row per player in a round: hand, stack, bet and status at its end
+actions   one row per action: turn, seat, action code and amount, bet, stack, status
+
+Cards are deuces ints (0 for missing ones). Game numbers run across the chunks.
+"""
+import argparse
+import os
+from os.path import join
+import numpy as np
+import yaml
+from pktools.deuces.card import Card
+from tournament.hand_log import read_games
+
+ACTIONS = ('fold', 'call', 'all in', 'timeout', 'bet') # 'bet': int decision, see amount
+STATUSES = ('in', 'out', 'all in')
+TABLES = ('games', 'seats', 'rounds', 'players', 'actions')
+
+GAME_DTYPE = np.dtype([('game', 'i8'), ('tournament_ID', 'U32'), ('game_date', 'U26'), ('n_players', 'i1'),
+                       ('blind', 'i4'), ('minimum_raise', 'i4'), ('timeout', 'f4'), ('initial_stack', 'i4'),
+                       ('n_rounds', 'i4'), ('seat_start', 'i8'), ('seat_stop', 'i8'),
+                       ('round_start', 'i8'), ('round_stop', 'i8'), ('player_start', 'i8'), ('player_stop', 'i8'),
+                       ('action_start', 'i8'), ('action_stop', 'i8')])
+SEAT_DTYPE = np.dtype([('game', 'i8'), ('seat', 'i1'), ('model', 'U64')])
+ROUND_DTYPE = np.dtype([('game', 'i8'), ('round', 'i4'), ('community', 'i4', (5,)), ('winners', 'i8'),
+                        ('player_start', 'i8'), ('player_stop', 'i8'),
+                        ('action_start', 'i8'), ('action_stop', 'i8')])
+PLAYER_DTYPE = np.dtype([('game', 'i8'), ('round', 'i4'), ('seat', 'i1'), ('hand', 'i4', (2,)),
+                         ('stack', 'i4'), ('bet', 'i4'), ('status', 'i1'), ('action', 'i1'), ('amount', 'i8')])
+ACTION_DTYPE = np.dtype([('game', 'i8'), ('round', 'i4'), ('turn', 'i1'), ('seat', 'i1'), ('action', 'i1'),
+                         ('amount', 'i8'), ('bet', 'i4'), ('stack', 'i4'), ('status', 'i1')])
+DTYPES = {'games': GAME_DTYPE, 'seats': SEAT_DTYPE, 'rounds': ROUND_DTYPE,
+          'players': PLAYER_DTYPE, 'actions': ACTION_DTYPE}
+
+
+def encode_action(last_action):
+    """(action code, amount) of a logged decision: 'fold', 'call', 'all in', 'timeout' or an amount"""
+    if last_action in ACTIONS:
+        return ACTIONS.index(last_action), 0
+    if last_action == '' or last_action is None:
+        # player who didn't act yet
+        return -1, 0
+    return ACTIONS.index('bet'), int(last_action)
+
+
+def _cards(strings, n):
+    cards = [Card.str_to_int(card) for card in strings]
+    return cards + [0] * (n - len(cards))
+
+
+def _chunks(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory) if name.startswith('chunk_') and name[6:].isdigit())
+
+
+def export_games(games, directory):
+    """
+    Writes games as a new chunk of the history in directory
+    :param games: game logs with the structure of Game's logs: settings, 'player_models' and
+                  'game_history' (e.g. tournament.hand_log.read_games output, or a YAML log)
+    :return: path of the chunk, None if there was no game
+    """
+    chunks = _chunks(directory)
+    first_game = 0
+    if chunks:
+        last_games = np.load(join(directory, chunks[-1], 'games.npy'), mmap_mode='r')
+        first_game = int(last_games['game'][-1]) + 1 if len(last_games) else 0
+
+    rows = {name: [] for name in TABLES}
+    for game, log in enumerate(games, first_game):
+        seat_start, round_start = len(rows['seats']), len(rows['rounds'])
+        player_start, action_start = len(rows['players']), len(rows['actions'])
+
+        for round_info in log['game_history']:
+            round_nb = round_info['round_number']
+            round_player_start, round_action_start = len(rows['players']), len(rows['actions'])
+            for player in round_info['players_info']:
+                rows['players'].append((game, round_nb, player['ID'], _cards(player.get('hand', ()), 2),
+                                        player['stack'], player['bet'], STATUSES.index(player['status']),
+                                        *encode_action(player['last_action'])))
+            for turn, turn_actions in enumerate(round_info['round_history']):
+                for action in turn_actions:
+                    rows['actions'].append((game, round_nb, turn, action['ID'], *encode_action(action['last_action']),
+                                            action['bet'], action['stack'], STATUSES.index(action['status'])))
+            rows['rounds'].append((game, round_nb, _cards(round_info['community'], 5),
+                                   sum(1 << seat for seat in round_info['winner']),
+                                   round_player_start, len(rows['players']), round_action_start, len(rows['actions'])))
+
+        for seat, model in sorted(log.get('player_models', {}).items(),
+                                  key=lambda item: int(item[0].replace('player_', ''))):
+            rows['seats'].append((game, int(seat.replace('player_', '')), model))
+        rows['games'].append((game, log.get('tournament_ID', ''), log.get('game_date', ''), log['n_players'],
+                              log['blind'], log['minimum raise'], log['timeout'], log['initial stack'],
+                              len(log['game_history']), seat_start, len(rows['seats']),
+                              round_start, len(rows['rounds']), player_start, len(rows['players']),
+                              action_start, len(rows['actions'])))
+
+    if not rows['games']:
+        return None
+
+    # written aside then renamed, so that readers never see a partial chunk
+    chunk = join(directory, 'chunk_%06d' % (int(chunks[-1][len('chunk_'):]) + 1 if chunks else 0))
+    os.makedirs(chunk + '.tmp')
+    for name in TABLES:
+        np.save(join(chunk + '.tmp', name + '.npy'), np.array(rows[name], dtype=DTYPES[name]))
+    os.replace(chunk + '.tmp', chunk)
+    return chunk
+
+
+class ColumnarHistory:
+    """Reader of a history directory: the tables are memory-mapped, chunk by chunk"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.chunks = [{name: np.load(join(directory, chunk, name + '.npy'), mmap_mode='r') for name in TABLES}
+                       for chunk in _chunks(directory)]
+        # first game number of each chunk, to find a game's chunk
+        self.first_games = np.array([chunk['games']['game'][0] if len(chunk['games']) else -1
+                                     for chunk in self.chunks], dtype=np.int64)
+
+    def __len__(self):
+        return sum(len(chunk['games']) for chunk in self.chunks)
+
+    def table(self, name):
+        """
+        Structured array of a table over every chunk: a memory map when there is a single chunk,
+        a concatenated copy otherwise (iterate on self.chunks to avoid the copy)
+        """
+        if len(self.chunks) == 1:
+            return self.chunks[0][name]
+        if not self.chunks:
+            return np.zeros(0, dtype=DTYPES[name])
+        return np.concatenate([chunk[name] for chunk in self.chunks])
+
+    def dataframe(self, name):
+        """pandas DataFrame of a table, array fields (cards) being split into one column per card"""
+        import pandas as pd
+
+        array = self.table(name)
+        columns = {}
+        for field in array.dtype.names:
+            if array.dtype[field].shape:
+                for i in range(array.dtype[field].shape[0]):
+                    columns['%s_%d' % (field, i)] = array[field][:, i]
+            else:
+                columns[field] = array[field]
+        return pd.DataFrame(columns)
+
+    def game(self, game):
+        """rows of every table for one game number, as views on the chunk's memory maps"""
+        chunk = self.chunks[int(np.searchsorted(self.first_games, game, side='right')) - 1]
+        row = int(game - chunk['games']['game'][0])
+        info = chunk['games'][row]
+        if info['game'] != game:
+            raise KeyError(game)
+        tables = {'games': chunk['games'][row:row + 1]}
+        for name, prefix in (('seats', 'seat'), ('rounds', 'round'), ('players', 'player'), ('actions', 'action')):
+            tables[name] = chunk[name][info[prefix + '_start']:info[prefix + '_stop']]
+        return tables
+
+
+def read_log(log_file):
+    """games of a game log, streamed (JSON Lines) or YAML"""
+    if log_file.endswith(('.yaml', '.yml')):
+        with open(log_file, encoding='utf8') as infile:
+            return [yaml.safe_load(infile)]
+    return list(read_games(log_file))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='adds game logs to a columnar history, as one chunk')
+    parser.add_argument('directory', help='history directory')
+    parser.add_argument('logs', nargs='+', help='game logs (.jsonl or .yaml)')
+    args = parser.parse_args()
+
+    print(export_games((game for log_file in args.logs for game in read_log(log_file)), args.directory))
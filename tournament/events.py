@@ -0,0 +1,70 @@
+"""
+Game events.
+
+The game emits an event at each step of a round to the sinks registered on it.
+Without any sink, nothing is built nor written, so large simulations run
+without I/O. An event is a name (one of the constants below) and a dict:
+
+ROUND_START   round_number, players_in (IDs), dealer
+TURN_START    round_number, turn_number, community (strings)
+ACTION        round_number, turn_number, ID, decision (model output),
+              action ('fold', 'timeout', 'call', 'raise' or 'all in'), bet, stack
+SHOWDOWN      round_number, community, players (player data with hands)
+POT_AWARD     round_number, pots (list of (chips, eligible IDs)), awards (chips per player)
+ROUND_END     round_number, community, players (player data with hands)
+"""
+import sys
+
+ROUND_START = 'round start'
+TURN_START = 'turn start'
+ACTION = 'action'
+SHOWDOWN = 'showdown'
+POT_AWARD = 'pot award'
+ROUND_END = 'round end'
+
+
+class EventSink:
+    """Base sink, ignores every event (null sink)"""
+
+    def emit(self, event, data):
+        pass
+
+
+class ConsoleSink(EventSink):
+    """Writes the game's progress in a human readable form, by default to stdout"""
+
+    ACTION_MESSAGES = {'fold': 'folds', 'timeout': 'timed out', 'call': 'calls',
+                       'raise': 'raises', 'all in': 'goes all in'}
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def __print(self, *args):
+        print(*args, file=self.stream if self.stream is not None else sys.stdout)
+
+    def emit(self, event, data):
+        if event == ROUND_START:
+            self.__print('Starting round %d with players %s' % (data['round_number'], str(data['players_in'])))
+        elif event == TURN_START:
+            self.__print('\n turn %d' % data['turn_number'])
+            self.__print(data['community'])
+            self.__print('\n actions:')
+        elif event == ACTION:
+            self.__print('player %d %s' % (data['ID'], ConsoleSink.ACTION_MESSAGES[data['action']]))
+        elif event in (SHOWDOWN, ROUND_END):
+            for player in data['players']:
+                self.__print("player %d: \t Stack: %d \t Bets: %d \t Status: %s "
+                             % (player['ID'], player['stack'], player['bet'], player['status']))
+                self.__print(player['hand'])
+            self.__print("community:")
+            self.__print(data['community'])
+
+
+class MemorySink(EventSink):
+    """Keeps every event as a (name, data) tuple in self.events"""
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, data):
+        self.events.append((event, data))
@@ -0,0 +1,158 @@
+"""
+Streaming hand history.
+
+A game log is a JSON Lines file written as the game goes: a 'game' record with
+the game's settings and models, one 'round' record per completed round (the
+entries of the former game_history) and a 'summary' record at the end. Each
+record is flushed when written, so a crash only loses the round being played,
+and nothing is kept in memory. Files are only appended to: several games can
+share a file.
+
+A writer can rotate its file once it exceeds max_bytes: the full file is renamed
+<path>.<n> (n = 1, 2...), and gzipped if asked to. read_records reads the parts
+in order, then the current file.
+"""
+import glob
+import gzip
+import json
+import os
+import re
+import shutil
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    # numpy scalars are written as numbers
+    return value.item()
+
+
+def dumps(record):
+    """one JSON line, with orjson if it is installed"""
+    if orjson is not None:
+        return orjson.dumps(record, default=_default, option=orjson.OPT_SERIALIZE_NUMPY) + b'\n'
+    return (json.dumps(record, default=_default, ensure_ascii=False) + '\n').encode('utf8')
+
+
+def loads(line):
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+class HandLogWriter:
+
+    def __init__(self, path, max_bytes=None, compress=False):
+        """
+        :param path: JSON Lines file, appended to
+        :param max_bytes: size above which the file is rotated (checked after each record), default: never
+        :param compress: gzip the rotated parts
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.file = open(path, 'ab')
+        self.__end_partial_line()
+
+    def __end_partial_line(self):
+        """a record cut by a crash is closed, so that the next record starts on its own line"""
+        if self.file.tell() > 0:
+            with open(self.path, 'rb') as infile:
+                infile.seek(-1, os.SEEK_END)
+                if infile.read(1) != b'\n':
+                    self.file.write(b'\n')
+
+    def write(self, record):
+        self.file.write(dumps(record))
+        self.file.flush()
+        if self.max_bytes is not None and self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        """moves the current file to the next free part number and starts a new file"""
+        self.file.close()
+        part = '%s.%d' % (self.path, len(_parts(self.path)) + 1)
+        os.replace(self.path, part)
+        if self.compress:
+            with open(part, 'rb') as infile, gzip.open(part + '.gz', 'wb') as outfile:
+                shutil.copyfileobj(infile, outfile)
+            os.remove(part)
+        self.file = open(self.path, 'ab')
+
+    def close(self):
+        self.file.close()
+
+
+def _parts(path):
+    """rotated parts of path, in order"""
+    pattern = re.compile(re.escape(path) + r'\.(\d+)(\.gz)?$')
+    parts = [(int(match.group(1)), name) for name in glob.glob(glob.escape(path) + '.*')
+             for match in [pattern.match(name)] if match]
+    return [name for _, name in sorted(parts)]
+
+
+def read_records(path):
+    """every record of a log (rotated parts included), in the order they were written"""
+    for name in _parts(path) + ([path] if os.path.exists(path) else []):
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(name, 'rb') as infile:
+            for line in infile:
+                try:
+                    yield loads(line)
+                except ValueError:
+                    # record cut by a crash
+                    continue
+
+
+def read_games(path):
+    """
+    Games of a log, with the structure of the former YAML logs: the game record's fields,
+    'game_history' (the round records) and 'summary' (None if the game did not finish)
+    """
+    game = None
+    for record in read_records(path):
+        kind = record.pop('type')
+        if kind == 'game':
+            if game is not None:
+                yield game
+            game = {**record, 'game_history': [], 'summary': None}
+        elif kind == 'round':
+            game['game_history'].append(record)
+        elif kind == 'summary':
+            game['summary'] = record
+    if game is not None:
+        yield game
+
+
+
+def read_finished_games(path, position=(0, 0)):
+    """
+    Finished games (with their summary) of a log, from a position on, to resume reading a log
+    that is still appended to. Games cut by a crash are skipped
+    :param position: (file number, byte offset) in the log's rotated parts followed by its current
+                     file. It doesn't change when the current file is rotated
+    :return: generator of (game, position of the end of the game's summary record)
+    """
+    files = _parts(path) + ([path] if os.path.exists(path) else [])
+    game = None
+    for index in range(position[0], len(files)):
+        offset = position[1] if index == position[0] else 0
+        opener = gzip.open if files[index].endswith('.gz') else open
+        with opener(files[index], 'rb') as infile:
+            infile.seek(offset)
+            for line in infile:
+                offset += len(line)
+                try:
+                    record = loads(line)
+                except ValueError:
+                    continue
+                kind = record.pop('type')
+                if kind == 'game':
+                    game = {**record, 'game_history': [], 'summary': None}
+                elif kind == 'round' and game is not None:
+                    game['game_history'].append(record)
+                elif kind == 'summary' and game is not None:
+                    game['summary'] = record
+                    yield game, (index, offset)
+                    game = None
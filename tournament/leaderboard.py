@@ -0,0 +1,211 @@
+"""
+Leaderboard over every tournament played.
+
+A Leaderboard ingests game logs and keeps, for each model: games and rounds
+played, rounds won, chip delta (chips won over the game's rounds: final stack -
+initial stack, except in duplicate mode where every deal starts from the initial
+stacks) and an Elo rating. A game counts as a round robin of the models at its
+table, ranked by their chip deltas: each pair of models is a win, a loss or a draw,
+and the rating updates are scaled by 1 / (number of opponents). A model seated
+twice (see tournament_runner.make_tables) counts one game, ranked by its mean
+delta per seat, and plays the rounds of both its seats.
+
+Its state (a JSON file) remembers the logs already ingested: a streamed log (with
+its rotated parts) is read again from where its last finished game ended, a YAML
+log is read once. Ingesting a new tournament costs O(new games).
+
+Command line:
+    python -m tournament.leaderboard update [--state FILE] LOGS_OR_DIRECTORIES...
+    python -m tournament.leaderboard show [--state FILE] [--sort COLUMN] [--top N]
+"""
+import argparse
+import json
+import os
+from os.path import join
+import yaml
+from tournament.hand_log import read_finished_games
+
+DEFAULT_STATE = join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'leaderboard.json')
+COLUMNS = ('rating', 'games', 'chip_delta', 'chips_per_game', 'rounds', 'rounds_won', 'win_rate')
+
+
+def final_stacks(game):
+    """stack of each seat at the end of a game (YAML logs have no summary: the last round is used)"""
+    if game.get('summary') is not None:
+        return {int(seat.replace('player_', '')): stack for seat, stack in game['summary']['stacks'].items()}
+    stacks = {seat: 0 for seat in range(game['n_players'])}
+    if game['game_history']:
+        for player in game['game_history'][-1]['players_info']:
+            stacks[player['ID']] = player['stack']
+    else:
+        stacks = {seat: game['initial stack'] for seat in stacks}
+    return stacks
+
+
+def chip_deltas(game):
+    """chips won by each seat over a game: the sum of the rounds' deltas in duplicate mode"""
+    if game.get('summary') is not None and 'chip_deltas' in game['summary']:
+        return {int(seat.replace('player_', '')): delta for seat, delta in game['summary']['chip_deltas'].items()}
+    if game.get('duplicate'):
+        return {seat: sum(round_info['chip_deltas'][seat] for round_info in game['game_history'])
+                for seat in range(game['n_players'])}
+    return {seat: stack - game['initial stack'] for seat, stack in final_stacks(game).items()}
+
+
+def dealt_in(game):
+    """
+    (round, seats dealt in it) for each round of a game, including the seats busting in the round
+    (a round's players_in are the seats still in after it)
+    """
+    seats = list(range(game['n_players']))
+    for round_info in game['game_history']:
+        yield round_info, seats
+        if not game.get('duplicate'):
+            seats = round_info['players_in']
+
+
+def find_logs(paths):
+    """
+    game logs among paths, directories being searched recursively: streamed logs (their rotated parts
+    are read with them) and YAML logs, tournament summaries excepted
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith('.jsonl') or (name.endswith('.yaml') and not name.endswith('summary.yaml')):
+                    yield join(root, name)
+
+
+class Leaderboard:
+
+    ELO_START = 1500
+    ELO_K = 32
+
+    def __init__(self, state_file=DEFAULT_STATE):
+        """
+        :param state_file: JSON file of the leaderboard, loaded if it exists
+        """
+        self.state_file = state_file
+        self.models = {} # statistics by model name
+        self.logs = {} # by absolute path: position where to resume a streamed log, None for a YAML log
+        if state_file is not None and os.path.exists(state_file):
+            with open(state_file, encoding='utf8') as infile:
+                state = json.load(infile)
+            self.models = state['models']
+            self.logs = state['logs']
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+        with open(self.state_file + '.tmp', 'w', encoding='utf8') as outfile:
+            json.dump({'models': self.models, 'logs': self.logs}, outfile, indent=1)
+        os.replace(self.state_file + '.tmp', self.state_file)
+
+    def __model(self, name):
+        return self.models.setdefault(name, {'rating': float(self.ELO_START), 'games': 0, 'chip_delta': 0,
+                                             'rounds': 0, 'rounds_won': 0})
+
+    def add_game(self, game):
+        """
+        Adds a game to the statistics
+        :param game: game log, with the structure of tournament.hand_log.read_games output or of a YAML log
+        """
+        seats = {int(seat.replace('player_', '')): model for seat, model in game['player_models'].items()}
+        deltas = chip_deltas(game)
+        model_seats = {}
+        for seat, model in seats.items():
+            model_seats.setdefault(model, []).append(seat)
+
+        for model, its_seats in model_seats.items():
+            stats = self.__model(model)
+            stats['games'] += 1
+            stats['chip_delta'] += sum(deltas[seat] for seat in its_seats)
+        for round_info, dealt in dealt_in(game):
+            for seat in dealt:
+                stats = self.__model(seats[seat])
+                stats['rounds'] += 1
+                stats['rounds_won'] += seat in round_info['winner']
+
+        # every rating update uses the ratings from before the game
+        means = {model: sum(deltas[seat] for seat in its_seats) / len(its_seats)
+                 for model, its_seats in model_seats.items()}
+        ratings = {model: self.models[model]['rating'] for model in model_seats}
+        updates = {model: 0. for model in model_seats}
+        for model in model_seats:
+            opponents = [other for other in model_seats if other != model]
+            for other in opponents:
+                expected = 1 / (1 + 10 ** ((ratings[other] - ratings[model]) / 400))
+                score = 1. if means[model] > means[other] else 0.5 if means[model] == means[other] else 0.
+                updates[model] += self.ELO_K * (score - expected) / len(opponents)
+        for model, update in updates.items():
+            self.models[model]['rating'] += update
+
+    def ingest(self, log_file):
+        """
+        Adds the games of a log not ingested yet
+        :return: number of games added
+        """
+        path = os.path.abspath(log_file)
+        n_games = 0
+        if path.endswith(('.yaml', '.yml')):
+            if path not in self.logs:
+                with open(path, encoding='utf8') as infile:
+                    self.add_game(yaml.safe_load(infile))
+                self.logs[path] = None
+                n_games = 1
+        else:
+            for game, position in read_finished_games(path, tuple(self.logs.get(path, (0, 0)))):
+                self.add_game(game)
+                self.logs[path] = list(position)
+                n_games += 1
+        return n_games
+
+    def update(self, paths):
+        """
+        Ingests every log found in paths (files or directories) and saves the state
+        :return: number of games added
+        """
+        n_games = sum(self.ingest(log_file) for log_file in find_logs(paths))
+        if self.state_file is not None:
+            self.save()
+        return n_games
+
+    def standings(self, sort='rating'):
+        """one row per model, best first according to sort (one of COLUMNS)"""
+        rows = [{'model': name, **stats,
+                 'chips_per_game': stats['chip_delta'] / stats['games'] if stats['games'] else 0.,
+                 'win_rate': stats['rounds_won'] / stats['rounds'] if stats['rounds'] else 0.}
+                for name, stats in self.models.items()]
+        return sorted(rows, key=lambda row: row[sort], reverse=True)
+
+
+def format_standings(rows):
+    lines = ['%-4s %-30s %8s %6s %10s %10s %8s %8s' % ('rank', 'model', 'rating', 'games', 'chip delta',
+                                                     'chips/game', 'rounds', 'win rate')]
+    for rank, row in enumerate(rows, 1):
+        lines.append('%-4d %-30s %8.1f %6d %10d %10.1f %8d %8.3f'
+                     % (rank, row['model'], row['rating'], row['games'], row['chip_delta'],
+                        row['chips_per_game'], row['rounds'], row['win_rate']))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='standings of the models over every tournament')
+    parser.add_argument('--state', default=DEFAULT_STATE, help='leaderboard file (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    update_parser = commands.add_parser('update', help='ingests new games')
+    update_parser.add_argument('logs', nargs='+', help='game logs, or directories searched for logs')
+    show_parser = commands.add_parser('show', help='prints the standings')
+    show_parser.add_argument('--sort', choices=COLUMNS, default='rating')
+    show_parser.add_argument('--top', type=int, default=None, help='number of models shown')
+    args = parser.parse_args()
+
+    leaderboard = Leaderboard(args.state)
+    if args.command == 'update':
+        print('%d new games' % leaderboard.update(args.logs))
+    else:
+        print(format_standings(leaderboard.standings(args.sort)[:args.top]))
@@ -0,0 +1,120 @@
+"""
+Read-only views given to the models as input.
+
+Building the input of every decision used to copy the whole game history,
+which made long games slow down steadily. Instead, the game hands out views on
+its own append-only logs: a view is created in O(1), freezes the length of the
+log it looks at, and wraps the items it returns, so that a model can read
+everything it is allowed to but cannot modify the game's data. The small entries
+of the input (cards, player infos) are fresh plain lists and dicts, as before.
+"""
+from collections.abc import Mapping, Sequence
+
+
+def read_only(value):
+    """wraps lists and dicts into read-only views, other values are returned as they are"""
+    if isinstance(value, list):
+        return ListView(value)
+    if isinstance(value, dict):
+        return DictView(value)
+    return value
+
+
+def to_plain(value):
+    """deep copy of a view (or of any value) made of plain lists and dicts"""
+    if isinstance(value, (Sequence, list)) and not isinstance(value, str):
+        return [to_plain(item) for item in value]
+    if isinstance(value, Mapping):
+        return {key: to_plain(item) for key, item in value.items()}
+    return value
+
+
+class ListView(Sequence):
+    """Read-only view of the first stop items of a list (by default, its current length)"""
+    __slots__ = ('_source', '_stop')
+
+    def __init__(self, source, stop=None):
+        self._source = source
+        self._stop = len(source) if stop is None else max(0, min(stop, len(source)))
+
+    def __len__(self):
+        return self._stop
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [read_only(item) for item in self._source[:self._stop][index]]
+        if index < 0:
+            index += self._stop
+        if not 0 <= index < self._stop:
+            raise IndexError('list index out of range')
+        return read_only(self._source[index])
+
+    def __eq__(self, other):
+        return list(self) == list(other) if isinstance(other, (Sequence, list)) else NotImplemented
+
+    def __add__(self, other):
+        # concatenating gives a plain list, as with the lists the views replaced
+        return list(self) + list(other) if isinstance(other, (Sequence, list)) else NotImplemented
+
+    def __radd__(self, other):
+        return list(other) + list(self) if isinstance(other, (Sequence, list)) else NotImplemented
+
+    def __repr__(self):
+        return repr(to_plain(self))
+
+
+class DictView(Mapping):
+    """Read-only view of a dict"""
+    __slots__ = ('_source',)
+
+    def __init__(self, source):
+        self._source = source
+
+    def __getitem__(self, key):
+        return read_only(self._source[key])
+
+    def __iter__(self):
+        return iter(self._source)
+
+    def __len__(self):
+        return len(self._source)
+
+    def __repr__(self):
+        return repr(to_plain(self))
+
+
+class ModelInput(Mapping):
+    """
+    Input of a model's make_decision, with the same keys as the former input dict.
+
+    values holds the entries known upfront, lazy maps the other keys to functions
+    computing them, called on first access only. Entries are returned as they are:
+    the game gives views (see ListView) for the logs it shares with the models, and
+    values of the input's own for the rest.
+    """
+    __slots__ = ('_values', '_lazy')
+
+    def __init__(self, values, lazy=None):
+        self._values = values
+        self._lazy = lazy or {}
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            self._values[key] = self._lazy[key]()
+        return self._values[key]
+
+    def __iter__(self):
+        yield from self._values
+        for key in self._lazy:
+            if key not in self._values:
+                yield key
+
+    def __len__(self):
+        return len(self._values.keys() | self._lazy.keys())
+
+    def to_dict(self):
+        """plain dict copy of the input, e.g. to store or serialize it"""
+        return to_plain(self)
+
+    def __repr__(self):
+        return repr(self.to_dict())
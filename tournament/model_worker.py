@@ -0,0 +1,138 @@
+"""
+Sandboxed model execution.
+
+A ModelWorker runs a model's make_decision in its own long-lived process and
+talks to it through a pipe. A decision that misses its deadline gets the worker
+killed (and started again for the next decision), so a runaway model cannot keep
+burning the engine's CPU. Limits on the CPU time of a decision and on the memory
+of the process can be set on top of the deadline (Unix only: they use the
+resource module, imported by the worker when they are set).
+
+The game history only grows during a game, so the worker keeps its own copy and
+each request only carries the rounds it has not seen yet.
+"""
+import asyncio
+import importlib.util
+import inspect
+import math
+import multiprocessing
+from tournament.model_input import to_plain
+
+
+class ModelWorker:
+
+    def __init__(self, model, cpu_time=None, memory=None):
+        """
+        :param model: make_decision function (must be importable from its module)
+        :param cpu_time: CPU seconds allowed per decision (RLIMIT_CPU), default: no limit
+        :param memory: bytes of address space allowed to the worker process (RLIMIT_AS)
+        :raise NotImplementedError: limits are set on a platform without the resource module
+        """
+        if (cpu_time is not None or memory is not None) and importlib.util.find_spec('resource') is None:
+            raise NotImplementedError('CPU time and memory limits need the resource module (Unix only)')
+        self.model = model
+        self.cpu_time = cpu_time
+        self.memory = memory
+        self.process = None
+        self.connection = None
+        self.n_history_sent = 0
+
+    def start(self):
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve,
+                                               args=(child_connection, self.model, self.cpu_time, self.memory),
+                                               daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.n_history_sent = 0
+
+    def kill(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.connection.close()
+        self.process = None
+        self.connection = None
+
+    def close(self):
+        """stops the worker, letting it exit on its own if it is idle"""
+        if self.process is not None and self.process.is_alive():
+            try:
+                self.connection.send(None)
+                self.process.join(1)
+            except (OSError, EOFError):
+                pass
+        self.kill()
+
+    def __call__(self, input, time_delay):
+        """
+        Runs the model on input in the worker
+        :return: the model's decision
+        :raise TimeoutError: the decision took more than time_delay seconds, the worker is killed
+        :raise RuntimeError: the model raised an exception or the worker died
+        """
+        if self.process is None or not self.process.is_alive():
+            self.kill()
+            self.start()
+
+        history = input['game history']
+        new_history = [to_plain(entry) for entry in history[self.n_history_sent:]]
+        request = {key: to_plain(input[key]) for key in input if key != 'game history'}
+
+        try:
+            self.connection.send((request, self.n_history_sent, new_history))
+            self.n_history_sent = len(history)
+            answered = self.connection.poll(time_delay)
+            if answered:
+                status, result = self.connection.recv()
+        except (OSError, EOFError):
+            # the worker died, e.g. killed by its CPU or memory limit
+            self.kill()
+            raise RuntimeError('model [%s] worker died' % self.model.__name__)
+
+        if not answered:
+            self.kill()
+            raise TimeoutError('model [%s] timeout [%s seconds] exceeded!' % (self.model.__name__, time_delay))
+
+        if status == 'error':
+            raise RuntimeError('model [%s] raised %s' % (self.model.__name__, result))
+        return result
+
+
+def _serve(connection, model, cpu_time, memory):
+    """worker process loop: applies the limits, then answers requests until it gets None"""
+    if cpu_time is not None or memory is not None:
+        import resource
+    if memory is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    history = []
+
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+
+        request, history_start, new_history = message
+        del history[history_start:]
+        history += new_history
+        request['game history'] = history
+
+        if cpu_time is not None:
+            # the soft limit is raised before each decision: the limit is per decision
+            used = resource.getrusage(resource.RUSAGE_SELF)
+            limit = math.ceil(used.ru_utime + used.ru_stime + cpu_time)
+            hard_limit = resource.getrlimit(resource.RLIMIT_CPU)[1]
+            if hard_limit != resource.RLIM_INFINITY:
+                limit = min(limit, hard_limit)
+            resource.setrlimit(resource.RLIMIT_CPU, (limit, hard_limit))
+
+        try:
+            decision = model(request)
+            if inspect.iscoroutine(decision):
+                decision = asyncio.run(decision)
+            connection.send(('ok', decision))
+        except Exception as e:
+            connection.send(('error', repr(e)))
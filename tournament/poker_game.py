@@ -1,10 +1,18 @@
+import asyncio
 from datetime import datetime
+import inspect
+import random
 from pktools.deuces.evaluator import Evaluator
 from pktools.deuces.card import Card
 from pktools.deuces.deck import Deck
 import numpy as np
-import pandas as pd
-from tournament.timeout import timeout
+from tournament.pots import create_pots, distribute_pots
+from tournament import events
+from tournament.model_input import ModelInput, ListView
+from tournament.bot_protocol import BotPool
+from tournament.hand_log import HandLogWriter
+from tournament.columnar_history import export_games
+from tournament.timeout import timeout, run_in_thread
 import yaml
 
 
@@ -18,11 +26,16 @@ loop -> Game starts round
              -> player calls model decision(input)
              -> player updates status
     -> Game distributes round gains
+
+The loops are generators yielding (player, input) whenever a model must decide,
+and receiving the model's decision back: play_game runs the models one after the
+other, play_game_async awaits them, so that one event loop can run many tables.
 """
 
 class Player:
-    def __init__(self, model, ID, stack = 1000 ):
+    def __init__(self, model, ID, stack = 1000, worker = None):
         self.model = model
+        self.worker = worker # ModelWorker running the model in its own process, if any
         self.ID = ID
         self.stack = stack
         self.hand = []
@@ -35,7 +48,7 @@ class Player:
         """returns a quick snapshot of player status, for logging and model's input"""
         info = {"ID":self.ID, "last_action":self.last_action, "stack":self.stack, "bet":int(self.bet), "status":self.round_status}
         if not hide_hand:
-            info["hand"] = self.hand
+            info["hand"] = Card.hand_to_str(self.hand)
         return info
 
     def __bet(self, amount):
@@ -72,14 +85,54 @@ class Player:
         :param input: input to provide to the decision algorithm (std to be defined)
         :param current_raise: what is the current highest bet
         :param minimum_raise: what is the minimum amount for a raise
-        :return:
+        :return: the action taken: 'fold', 'timeout', 'call', 'raise' or 'all in'
         """
+        return self.apply_decision(self.decide(input, time_delay), current_raise, minimum_raise)
 
+    def decide(self, input, time_delay):
+        """
+        Calls the decision algorithm (in its worker if any, awaiting it if it is a coroutine function)
+        :return: the model's output, 'timeout' if it was too slow or failed
+        """
         try:
-            decision = timeout(time_delay=time_delay)(self.model)(input)
+            if self.worker is not None:
+                decision = self.worker(input, time_delay)
+            elif inspect.iscoroutinefunction(self.model):
+                decision = asyncio.run(asyncio.wait_for(self.model(input), time_delay))
+            else:
+                decision = timeout(time_delay=time_delay)(self.model)(input)
         except Exception:
             decision = 'timeout'
+        return decision
 
+    async def decide_async(self, input, time_delay, executor=None):
+        """
+        Coroutine version of decide: coroutine models are awaited, synchronous models run in a thread
+        of their own for each decision (see timeout.run_in_thread) and workers in executor (default:
+        the event loop's one), so that the loop serves other tables meanwhile. A synchronous model that
+        misses its deadline is not stopped, but its thread is left to it: it doesn't hold up other
+        decisions. Use a worker to have it killed. Workers return once their deadline is passed, so
+        they never keep a thread of executor
+        :return: the model's output, 'timeout' if it was too slow or failed
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            if self.worker is not None:
+                decision = await loop.run_in_executor(executor, self.worker, input, time_delay)
+            elif inspect.iscoroutinefunction(self.model):
+                decision = await asyncio.wait_for(self.model(input), time_delay)
+            else:
+                decision = await asyncio.wait_for(run_in_thread(self.model, input), time_delay)
+        except Exception:
+            decision = 'timeout'
+        return decision
+
+    def apply_decision(self, decision, current_raise, minimum_raise):
+        """
+        Implements the decision of the model, making sure it is legal
+        :param decision: output of the decision algorithm
+        :return: the action taken: 'fold', 'timeout', 'call', 'raise' or 'all in'
+        """
         self.last_action = decision
 
         calling_bet = current_raise - self.bet
@@ -89,15 +142,16 @@ class Player:
 
         if decision == 'fold':
             self.round_status = 'out'
-            print('player %d folds' % self.ID)
+            action = 'fold'
         elif decision == 'timeout':
             self.round_status = 'out'
-            print('player %d timed out' % self.ID)
+            action = 'timeout'
         elif decision == 'all in':
             self.__bet(self.stack)
+            action = 'all in'
         elif decision == 'call':
             self.__bet(calling_bet)
-            print('player %d calls' % self.ID)
+            action = 'call'
         else:
             try:
                 # checking if the decision is a value to bet
@@ -105,15 +159,15 @@ class Player:
                 # check if the value correspond to calling
                 if to_bet == (calling_bet):
                     self.__bet(to_bet)
-                    print('player %d calls' % self.ID)
+                    action = 'call'
                 # check if the value correspond to all in
                 elif to_bet >= self.stack:
                     self.__bet(to_bet)
-                    print('player %d goes all in' % self.ID)
+                    action = 'all in'
                 # check if the value corresponds to a legal raise
                 elif (to_bet + self.bet) >= (current_raise + minimum_raise):
                     self.__bet(to_bet)
-                    print('player %d raises' % self.ID)
+                    action = 'raise'
                 else:
                     # here the value corresponds to no legal bet
                     raise ValueError("""amount being bet is not permitted.
@@ -127,7 +181,7 @@ class Player:
                 raise ValueError('output of decision algorithm must be fold, call or an int raise value'
                                  'instead got ' + str(decision))
 
-        return
+        return action
 
     def new_round(self, hand, blind=10):
 
@@ -140,21 +194,49 @@ class Player:
 
 class Game:
 
-    def __init__(self,log_file, models: list, tournament_id: str = 'none'):
+    def __init__(self,log_file, models: list, tournament_id: str = 'none', sinks: list = None,
+                 sandbox: bool = False, cpu_time: float = None, memory: int = None, rng=None,
+                 deals: list = None):
+        """
+        :param log_file: path of the game log: a .yaml file is written at the end of the game,
+                         any other path is a JSON Lines hand history appended to as the game goes
+                         (see tournament.hand_log). A HandLogWriter can be given instead of a path,
+                         None plays without writing any log (the history is only kept in memory)
+        :param models: make_decision functions, or BotPool for models running as executables
+        :param sandbox: run each model in its own worker process (see tournament.model_worker)
+                        instead of a thread per decision
+        :param cpu_time: with sandbox, CPU seconds allowed per decision
+        :param memory: with sandbox, bytes of memory allowed per model process
+        :param rng: random generator (or seed) of the decks, default: the random module
+        :param deals: duplicate mode, the deals of the rounds (see make_deals) instead of shuffled decks:
+                      each seat gets the same cards whoever sits there, so that the deals can be
+                      replayed with the models in other seats. Each deal is scored on its own: the
+                      players start every round with the initial stack (nobody busts out), so that a
+                      seat's result on a deal doesn't depend on the deals before it
+        """
 
         self.tournament_id = tournament_id
+        self.sandbox = sandbox
+        self.cpu_time = cpu_time
+        self.memory = memory
         self.initial_stack = 1000
         self.blind = 10
         self.minimum_raise = 10
         self.timeout = 5 # in seconds
 
-        self.deck = Deck()
+        # a seed is turned into a generator once, so that the rounds don't all get the same deal
+        self.rng = random.Random(rng) if rng is not None and not isinstance(rng, random.Random) else rng
+        self.deck = Deck(rng=self.rng)
         self.log_file = log_file
+        self.hand_log = None # HandLogWriter of a streamed log
+        self.deals = deals
 
-        self.players = [Player(model=model, ID=ID, stack=self.initial_stack)
+        self.players = [Player(model=model, ID=ID, stack=self.initial_stack, worker=self.__make_worker(model))
                         for ID, model in enumerate(models)]
+        # chips won by each seat over the rounds played (the sum of the rounds' chip_deltas)
+        self.chip_deltas = [0] * len(self.players)
 
-        self.community_cards = []
+        self.community_cards = [] # cards in int form, like the players' hands
 
         self.n_players = len(self.players)
         self.round_nb = 0
@@ -166,21 +248,105 @@ class Game:
         self.game_logger = [] # list of dict [{init_round_status, round_logger, final_round_status}]
         self.input_dict = {'player': [], 'opponents': [], 'round':[], 'game':[]}
 
+        # event sinks (see tournament.events), none by default: no output at all
+        self.sinks = list(sinks) if sinks else []
+
+    def __make_worker(self, model):
+        """bots (BotPool models) always run in their own processes, functions only with sandbox"""
+        if isinstance(model, BotPool):
+            return model.session()
+        if self.sandbox:
+            # imported here: the sandbox isn't available on every platform
+            from tournament.model_worker import ModelWorker
+            return ModelWorker(model, self.cpu_time, self.memory)
+        return None
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def __emit(self, event, data):
+        for sink in self.sinks:
+            sink.emit(event, data)
+
+    def __get_table_data(self):
+        return {'round_number': self.round_nb,
+                'community': Card.hand_to_str(self.community_cards),
+                'players': [player.get_player_data(hide_hand=False) for player in self.players]}
+
 
     def play_game(self, n_rounds=100):
 
+        steps = self.__play(n_rounds)
+        request = self.__resume(steps, None)
+        while request is not None:
+            player, input = request
+            request = self.__resume(steps, player.decide(input, self.timeout))
+
+    async def play_game_async(self, n_rounds=100, executor=None):
+        """
+        Coroutine version of play_game: the models' decisions are awaited (see Player.decide_async),
+        so that many games can be played concurrently on one event loop
+        :param executor: executor of the synchronous models, default: the event loop's one
+        """
+        steps = self.__play(n_rounds)
+        request = self.__resume(steps, None)
+        while request is not None:
+            player, input = request
+            request = self.__resume(steps, await player.decide_async(input, self.timeout, executor))
+
+    @staticmethod
+    def __resume(steps, decision):
+        """sends decision to the game's steps, returns the next (player, input) to decide, None at the end"""
+        try:
+            return steps.send(decision)
+        except StopIteration:
+            return None
+
+    @staticmethod
+    def make_deals(n_deals, seed=None):
+        """
+        Deals of a duplicate game: for each round, the order of a shuffled deck. Seat i gets its
+        cards 2i and 2i + 1, the board is made of the 5 cards following the last seat's
+        :return: list of lists of card ints
+        """
+        rng = random.Random(seed)
+        return [Deck(rng=rng).cards for _ in range(n_deals)]
+
+    def __play(self, n_rounds):
+
+        if self.deals is not None and len(self.deals) < n_rounds:
+            raise ValueError('%d deals for %d rounds' % (len(self.deals), n_rounds))
+
+        if isinstance(self.log_file, HandLogWriter):
+            self.hand_log = self.log_file
+        elif self.log_file is not None and not str(self.log_file).endswith(('.yaml', '.yml')):
+            self.hand_log = HandLogWriter(self.log_file)
+        if self.hand_log is not None:
+            self.hand_log.write({'type': 'game', **self.__get_log_header()})
+
         while self.round_nb < n_rounds:
 
             active_players = sum([player.game_status == 'in' for player in self.players])
-            if active_players < 2:
+            if active_players < 2 and self.deals is None:
                 break
 
-            self.__next_round()
+            yield from self.__next_round()
             self.round_nb += 1
 
-        self.__save_game_log()
-
-        return
+        for player in self.players:
+            if player.worker is not None:
+                player.worker.close()
+
+        if self.hand_log is not None:
+            self.hand_log.write({'type': 'summary',
+                                 'game_end_date': str(datetime.now()),
+                                 'rounds_played': self.round_nb,
+                                 'stacks': {"player_%d" % player.ID: player.stack for player in self.players},
+                                 'chip_deltas': {"player_%d" % player.ID: delta
+                                                 for player, delta in zip(self.players, self.chip_deltas)}})
+            self.hand_log.close()
+        elif self.log_file is not None:
+            self.__save_game_log()
 
     def __get_game_metadata(self):
         return {'n_players': self.n_players,
@@ -193,7 +359,7 @@ class Game:
         players_in = [i for i,player in enumerate(self.players) if player.game_status == 'in']
         return {'round_number': self.round_nb,
                 'players_in': players_in,
-                'community': self.community_cards,
+                'community': Card.hand_to_str(self.community_cards),
                 'players_info': [self.players[p].get_player_data(hide_hand=False) for p in players_in]}
 
     def __update_community(self):
@@ -201,11 +367,11 @@ class Game:
         if self.turn_nb == 0:
             pass
         elif self.turn_nb == 1:
-            self.community_cards += Card.int_to_str(self.deck.draw(3))
+            self.community_cards += self.deck.draw(3)
         elif self.turn_nb == 2:
-            self.community_cards += [Card.int_to_str(self.deck.draw(1))]
+            self.community_cards += [self.deck.draw(1)]
         elif self.turn_nb == 3:
-            self.community_cards += [Card.int_to_str(self.deck.draw(1))]
+            self.community_cards += [self.deck.draw(1)]
         elif self.turn_nb > 3:
             return
 
@@ -213,8 +379,8 @@ class Game:
 
         # we first compute the strength of each player's hand
         # warning: the evaluator gives value 0 to the best possible hand
-        evaluator = Evaluator()
-        hand_strength = np.array([evaluator.evaluate( Card.str_to_int(player.hand) , Card.str_to_int(self.community_cards))
+        evaluator = Evaluator.shared()
+        hand_strength = np.array([evaluator.evaluate(player.hand, self.community_cards)
                                   if player.round_status != 'out' else np.inf
                                   for player in self.players])
 
@@ -228,40 +394,55 @@ class Game:
     def __create_pots(self):
         """
         We spread the bets into pots, so that player all in who couldn't match the raise
-        are eligible only to the smaller pots.
+        are eligible only to the smaller pots. The bets are emptied into the pots.
         :return:
         """
-        # we make sure there is a 0 bet
-        bets = np.unique(np.sort([player.bet for player in self.players] + [0]))
-        pots = pd.DataFrame({'amount': [], 'eligible': [], 'content': []})
-
-        for i in range(1, len(bets)):
+        pots = create_pots([player.bet for player in self.players],
+                           [player.round_status != 'out' for player in self.players])
+        for player in self.players:
+            player.bet = 0
+        return pots
 
-            amount = bets[i]-bets[i-1]
-            pot_content = 0
-            eligible = []
+    def __distribute_pots(self, pots, ranking):
 
-            for ID, player in enumerate(self.players):
+        # odd chips go first to the player after the dealer
+        awards = distribute_pots(pots, ranking, first_seat=(self.dealer + 1) % self.n_players)
+        for player, award in zip(self.players, awards):
+            player.stack += award
+        return awards
 
-                if player.round_status != 'out' and player.bet >= amount:
-                    eligible += [ID]
-                pot_content += player.bet2pot(amount)
-            pots = pots.append({'amount': amount, 'eligible':np.array(eligible), 'content':pot_content},
-                               ignore_index=True)
-        return pots
 
-    def __distribute_pots(self, pots, ranking):
+    def __count_contesting(self):
+        """number of players still in the hand (in or all in)"""
+        return sum([player.round_status != 'out' for player in self.players])
 
-        for _, pot in pots.iterrows():
-            eligible_ranks = ranking[pot.eligible]
-            best_rank = min(eligible_ranks)
-            winners = pot.eligible[ eligible_ranks == best_rank ]
-            for winner in winners:
-                self.players[winner].stack += int(pot.content / len(winners))
+    def __award_uncontested(self):
+        """
+        Gives all the bets to the only player left in the hand: no more cards are
+        dealt and no hand is evaluated.
+        :return: pots, ranking (0 for the winner) and awards, like the showdown
+        """
+        winner = [player for player in self.players if player.round_status != 'out'][0]
+        total = sum([player.bet for player in self.players])
+        for player in self.players:
+            player.bet = 0
+        winner.stack += total
 
+        ranking = np.ones(self.n_players)
+        ranking[winner.ID] = 0
+        awards = [0] * self.n_players
+        awards[winner.ID] = total
+        return [(total, [winner.ID])], ranking, awards
 
     def __next_round(self):
 
+        if self.deals is not None:
+            # duplicate mode: every deal is played from the initial stacks
+            for player in self.players:
+                player.stack = self.initial_stack
+                player.game_status = 'in'
+        start_stacks = [player.stack for player in self.players]
+
         # reinitializing/updating round data
 
         self.players_info = [player.get_player_data() for player in self.players]
@@ -272,27 +453,43 @@ class Game:
         self.dealer %= self.n_players
 
         # distributing cards to players still in
-        self.deck = Deck()
+        if self.deals is not None:
+            self.deck.cards = self.deals[self.round_nb]
+            hands = self.deck.deal(self.n_players)
+        else:
+            self.deck = Deck(rng=self.rng)
         self.community_cards = []
 
-        print('Starting round %d with players %s'
-              % (self.round_nb, str([i for i,player in enumerate(self.players)
-                                     if player.game_status == 'in'])))
+        if self.sinks:
+            self.__emit(events.ROUND_START,
+                        {'round_number': self.round_nb,
+                         'players_in': [i for i, player in enumerate(self.players) if player.game_status == 'in'],
+                         'dealer': self.dealer})
 
         for player in self.players:
             if player.game_status == 'in':
-                player.new_round(hand=Card.int_to_str(self.deck.draw(2)), blind=self.blind)
+                player.new_round(hand=hands[player.ID] if self.deals is not None else self.deck.draw(2),
+                                 blind=self.blind)
 
-        # running the 4 betting turns
+        # running the 4 betting turns, unless everybody but one player folds
         for _ in range(4):
-            self.__next_turn()
-
-        self.display()
+            yield from self.__next_turn()
+            if self.__count_contesting() < 2:
+                break
+        # skipped turns are logged as turns without actions
+        self.round_logger += [[] for _ in range(4 - len(self.round_logger))]
 
         # attributing the gains
-        pots = self.__create_pots()
-        ranking = self.__rank_players()
-        self.__distribute_pots(pots, ranking)
+        if self.__count_contesting() == 1:
+            pots, ranking, awards = self.__award_uncontested()
+        else:
+            if self.sinks:
+                self.__emit(events.SHOWDOWN, self.__get_table_data())
+            pots = self.__create_pots()
+            ranking = self.__rank_players()
+            awards = self.__distribute_pots(pots, ranking)
+        if self.sinks:
+            self.__emit(events.POT_AWARD, {'round_number': self.round_nb, 'pots': pots, 'awards': awards})
 
         for player in self.players:
             if player.stack <= 0 and player.game_status != 'out':
@@ -304,16 +501,22 @@ class Game:
         self.game_logger[-1]['round_history'] = self.round_logger
 
         self.game_logger[-1]["winner"] = np.where(ranking == 0)[0].tolist()
-        self.display()
+        round_deltas = [player.stack - stack for player, stack in zip(self.players, start_stacks)]
+        self.game_logger[-1]["chip_deltas"] = round_deltas
+        self.chip_deltas = [total + delta for total, delta in zip(self.chip_deltas, round_deltas)]
+        if self.hand_log is not None:
+            self.hand_log.write({'type': 'round', **self.game_logger[-1]})
+        if self.sinks:
+            self.__emit(events.ROUND_END, self.__get_table_data())
 
     def __next_turn(self):
 
         self.round_logger += [[]]
         self.__update_community()
 
-        print('\n turn %d' % self.turn_nb)
-        print(self.community_cards)
-        print('\n actions:')
+        if self.sinks:
+            self.__emit(events.TURN_START, {'round_number': self.round_nb, 'turn_number': self.turn_nb,
+                                            'community': Card.hand_to_str(self.community_cards)})
 
         # Betting round
 
@@ -334,10 +537,13 @@ class Game:
             # checks if player is still playing (excluding all in)
             if player.round_status == 'in':
 
-                player.make_decision(input=self.__make_input(player, current_raise),
-                                     current_raise=current_raise,
-                                     minimum_raise=self.minimum_raise,
-                                     time_delay=self.timeout)
+                decision = yield player, self.__make_input(player, current_raise)
+                action = player.apply_decision(decision, current_raise=current_raise,
+                                               minimum_raise=self.minimum_raise)
+                if self.sinks:
+                    self.__emit(events.ACTION, {'round_number': self.round_nb, 'turn_number': self.turn_nb,
+                                                'ID': player.ID, 'decision': player.last_action, 'action': action,
+                                                'bet': player.bet, 'stack': player.stack})
 
                 # updating the data for the input dict
                 player_data = player.get_player_data()
@@ -357,17 +563,25 @@ class Game:
         # End of betting round
         self.turn_nb += 1
 
-    def __save_game_log(self):
+    def __get_log_header(self):
 
         models_dict = {}
         for player in self.players:
-            model_name = player.model.__module__.replace('.', ' ').split()[-1]
+            if isinstance(player.model, BotPool):
+                model_name = player.model.name
+            else:
+                model_name = player.model.__module__.replace('.', ' ').split()[-1]
             models_dict["player_%d" % player.ID] = model_name
 
-        log_dict = {**self.__get_game_metadata(),
-                    "tournament_ID": str(self.tournament_id),
-                    "game_date": str(datetime.now()),
-                    "player_models": models_dict,
+        return {**self.__get_game_metadata(),
+                "duplicate": self.deals is not None,
+                "tournament_ID": str(self.tournament_id),
+                "game_date": str(datetime.now()),
+                "player_models": models_dict}
+
+    def __save_game_log(self):
+
+        log_dict = {**self.__get_log_header(),
                     "game_history":self.game_logger
                     }
 
@@ -376,26 +590,33 @@ class Game:
 
         return
 
-    def __make_input(self, player, current_raise):
-        return {**self.__get_game_metadata(),
-                'current raise': current_raise,
-                'pot': sum([player.bet for player in self.players]),
-                'community': self.community_cards,
-                'hand': player.hand,
-                'player info':player.get_player_data(),
-                'others info': self.players_info,
-                'round history': self.round_logger,
-                'game history': self.game_logger[:-1]}
+    def export_history(self, directory):
+        """
+        Adds the rounds played so far to a columnar history (see tournament.columnar_history)
+        :return: path of the chunk written
+        """
+        return export_games([{**self.__get_log_header(), 'game_history': self.game_logger}], directory)
 
-        # [:-1] -> very important to not give last round info (contains all the hands values)
+    def __make_input(self, player, current_raise):
+        """
+        Input of a model, built in O(n_players): the histories are read-only views on the game's
+        logs, the other entries are plain lists and dicts of the input's own (the cards being
+        rendered as strings only if the model reads them), that the model may modify
+        """
+        community = list(self.community_cards)
+        hand = list(player.hand)
+        return ModelInput({**self.__get_game_metadata(),
+                           'current raise': current_raise,
+                           'pot': sum([player.bet for player in self.players]),
+                           'community ints': list(community),
+                           'hand ints': list(hand),
+                           'player info': player.get_player_data(),
+                           'others info': [dict(info) for info in self.players_info],
+                           'round history': ListView(self.round_logger),
+                           # len - 1 -> very important to not give last round info (contains all the hands values)
+                           'game history': ListView(self.game_logger, len(self.game_logger) - 1)},
+                          lazy={'community': lambda: Card.hand_to_str(community),
+                                'hand': lambda: Card.hand_to_str(hand)})
 
     def display(self):
-        for player in self.players:
-
-            print("player %d: \t Stack: %d \t Bets: %d \t Status: %s "
-                  %(player.ID, player.stack ,player.bet, player.round_status))
-            print(player.hand)
-
-        print("community:")
-        print(self.community_cards)
-
+        events.ConsoleSink().emit(events.ROUND_END, self.__get_table_data())
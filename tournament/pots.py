@@ -0,0 +1,71 @@
+"""
+Side pots.
+
+The bets of a round are split into pots, so that a player all in who couldn't
+match the raise is only eligible to the smaller pots. All amounts are integer
+chips, and no chip is lost when a pot is split.
+"""
+
+
+def create_pots(bets, contesting):
+    """
+    Splits the bets into pots, in one pass over the players sorted by bet.
+
+    Each distinct bet level adds a pot, made of the chips every player put
+    between the previous level and this one, which the contesting players who
+    bet at least this level can win. Consecutive pots with the same eligible
+    players are merged. Chips that no contesting player matched (a folded
+    player's uncalled bet) go back to the players who bet them.
+    :param bets: chips bet by each player (index = player ID)
+    :param contesting: for each player, whether he is still in the hand (has not folded)
+    :return: list of (chips in the pot, list of the IDs of the eligible players)
+    """
+    order = sorted(range(len(bets)), key=lambda ID: bets[ID])
+    pots = []
+    previous_level = 0
+
+    for i, ID in enumerate(order):
+        level = bets[ID]
+        if level == previous_level:
+            continue
+
+        # every player from i on in the order bet at least this level
+        involved = order[i:]
+        content = (level - previous_level) * len(involved)
+        eligible = sorted(p for p in involved if contesting[p])
+        if not eligible:
+            eligible = sorted(involved)
+
+        if pots and pots[-1][1] == eligible:
+            pots[-1] = (pots[-1][0] + content, eligible)
+        else:
+            pots.append((content, eligible))
+        previous_level = level
+
+    return pots
+
+
+def distribute_pots(pots, ranking, first_seat=0):
+    """
+    Gives each pot to its eligible players with the best (lowest) rank.
+
+    A pot that does not split evenly gives its odd chips one by one to the
+    winners closest to first_seat (usually the seat after the dealer), going
+    around the table, so the result is deterministic.
+    :param pots: as returned by create_pots
+    :param ranking: rank of each player's hand, 0 for the best
+    :param first_seat: ID of the first seat to receive odd chips
+    :return: chips won by each player
+    """
+    n_players = len(ranking)
+    awards = [0] * n_players
+
+    for content, eligible in pots:
+        best_rank = min(ranking[ID] for ID in eligible)
+        winners = sorted((ID for ID in eligible if ranking[ID] == best_rank),
+                         key=lambda ID: (ID - first_seat) % n_players)
+        share, odd_chips = divmod(content, len(winners))
+        for i, ID in enumerate(winners):
+            awards[ID] += share + (i < odd_chips)
+
+    return awards
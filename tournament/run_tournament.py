@@ -1,23 +1,67 @@
 import os
 import sys, inspect
+import argparse
 from os.path import join
 
 current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 parent_dir = os.path.dirname(current_dir)
 sys.path.insert(0, parent_dir)
 
-from tournament.poker_game import Game
-import importlib
+from tournament.tournament_runner import run_tournament, summarize
+from tournament.sequential_tournament import run_until_resolved
+from tournament.leaderboard import Leaderboard, DEFAULT_STATE, format_standings
+from datetime import datetime
 
-list_models_name = os.listdir(join(join(os.path.dirname(os.path.abspath(__file__)),".."),"models" ))
 
-if len(list_models_name) % 6 == 1:
-    list_models_name += [list_models_name[0]]
+if __name__ == '__main__':
 
-for i in range(0,len(list_models_name),6):
+    parser = argparse.ArgumentParser(description='plays all the models of the models directory against each other')
+    parser.add_argument('--rounds', type=int, default=30, help='rounds per table')
+    parser.add_argument('--workers', type=int, default=None, help='tables played at once (default: number of CPUs)')
+    parser.add_argument('--log-dir', default=None, help='default: tournament/logs/<tournament ID>')
+    parser.add_argument('--tournament-id', default=None, help='default: start date and time')
+    parser.add_argument('--sandbox', action='store_true', help='run each model in its own worker process')
+    parser.add_argument('--engine', choices=['processes', 'asyncio'], default='processes',
+                        help='play the tables on a process pool or on one event loop')
+    parser.add_argument('--duplicate', action='store_true',
+                        help='replay the deals of each table with the seats rotated (duplicate poker)')
+    parser.add_argument('--confidence', type=float, default=None,
+                        help='keep playing tables until the ranking reaches this confidence (e.g. 0.95)')
+    parser.add_argument('--max-hands', type=int, default=100000, help='budget of hands with --confidence')
+    parser.add_argument('--leaderboard', nargs='?', const=DEFAULT_STATE, default=None,
+                        help='adds the games to a leaderboard (default file: %s)' % DEFAULT_STATE)
+    args = parser.parse_args()
 
-    models = [importlib.import_module('models.'+model_name+'.'+model_name).make_decision
-              for model_name in list_models_name[i:i+6]]
+    tournament_id = args.tournament_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+    log_dir = args.log_dir or join(current_dir, 'logs', tournament_id)
 
-    game = Game( join(current_dir,"test.yaml"), models)
-    game.play_game(30)
+    if args.confidence is not None:
+        summary = run_until_resolved(log_dir, confidence=args.confidence, max_hands=args.max_hands,
+                                     n_rounds=args.rounds, n_workers=args.workers, tournament_id=tournament_id,
+                                     sandbox=args.sandbox, duplicate=args.duplicate)
+        for rank, model in enumerate(summary['ranking'], 1):
+            print('%d %s: %.2f chips per hand (%.2f to %.2f)' % (rank, model['model'], model['chips_per_hand'],
+                                                                 *model['interval']))
+        print('%s after %d hands (%d tables): confidence %.4f, %.4f required'
+              % ('resolved' if summary['resolved'] else 'budget spent', summary['hands_spent'],
+                 summary['tables_played'], summary['confidence_reached'], summary['confidence_required']))
+    else:
+        summary = run_tournament(log_dir, n_rounds=args.rounds, n_workers=args.workers, tournament_id=tournament_id,
+                                 sandbox=args.sandbox, engine=args.engine, duplicate=args.duplicate)
+
+        for table in summary['tables']:
+            if table['games'] == 1:
+                print('table %d (%d rounds): %s'
+                      % (table['table'], table['rounds_played'],
+                         ', '.join('%s %+d' % (p['model'], p['chip_delta']) for p in table['players'])))
+            else:
+                print('table %d (%d games, %d rounds): %s'
+                      % (table['table'], table['games'], table['rounds_played'],
+                         ', '.join('%s %+d' % (name, model['chip_delta'])
+                                   for name, model in summarize([table]).items())))
+    print('logs written to %s' % log_dir)
+
+    if args.leaderboard is not None:
+        leaderboard = Leaderboard(args.leaderboard)
+        leaderboard.update([log_dir])
+        print(format_standings(leaderboard.standings()))
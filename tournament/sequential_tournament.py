@@ -0,0 +1,169 @@
+"""
+Sequential tournament: tables are played until the ranking is resolved.
+
+The controller plays the models in steps, each step being a few tournaments (the
+models shuffled into tables). After each step, it reads the per-hand chip deltas
+of every game from the logs and bootstraps the tables: a table is resampled as a
+whole, since its hands depend on each other through the stacks (in duplicate mode,
+where every deal is played from the initial stacks, through the deals shared by its
+games). For each pair of models adjacent in
+the ranking (by chips won per hand), the confidence is the share of bootstrap
+samples keeping their order.
+
+It stops once every adjacent pair reaches the required confidence (and enough
+tables were played for the bootstrap to mean anything), or when the budget of
+hands is spent. Checking after every step is a multiple test: the
+required confidence is Bonferroni corrected over the pairs and the planned
+number of steps (budget / hands per step).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import math
+import os
+from os.path import join
+import random
+import numpy as np
+import yaml
+from tournament.hand_log import read_games
+from tournament.tournament_runner import TABLE_SIZE, init_worker, list_models, make_tables, play_table
+
+
+def hand_deltas(game):
+    """
+    Chip delta of each seat over each hand of a game
+    :return: {seat: list of the seat's deltas, one per hand it played}
+    """
+    if game.get('duplicate'):
+        # every seat plays every deal, from the initial stacks
+        return {seat: [round_info['chip_deltas'][seat] for round_info in game['game_history']]
+                for seat in range(game['n_players'])}
+    stacks = {seat: game['initial stack'] for seat in range(game['n_players'])}
+    deltas = {seat: [] for seat in stacks}
+    for round_info in game['game_history']:
+        # a round lists the players still in after it: the ones missing busted in it
+        end_stacks = {player['ID']: player['stack'] for player in round_info['players_info']}
+        for seat, stack in stacks.items():
+            if stack > 0:
+                deltas[seat].append(end_stacks.get(seat, 0) - stack)
+                stacks[seat] = end_stacks.get(seat, 0)
+    return deltas
+
+
+def table_totals(log_file, model_names):
+    """
+    Chips won and hands played by each model over the games of a table's log
+    :return: arrays (n_models,) of chips and of hands
+    """
+    index = {name: i for i, name in enumerate(model_names)}
+    chips, hands = np.zeros(len(model_names)), np.zeros(len(model_names))
+    for game in read_games(log_file):
+        for seat, deltas in hand_deltas(game).items():
+            model = index[game['player_models']['player_%d' % seat]]
+            chips[model] += sum(deltas)
+            hands[model] += len(deltas)
+    return chips, hands
+
+
+def ranking_confidence(chips, hands, model_names, n_bootstrap=10000, rng=None):
+    """
+    Ranking of the models by chips won per hand, with bootstrap confidences
+    :param chips: array (n_tables, n_models) of chips won per table
+    :param hands: array (n_tables, n_models) of hands played per table
+    :return: ranking (list of {model, chips_per_hand, interval}, best first, interval being the
+             95% bootstrap interval) and pairs (list of {better, worse, confidence}, adjacent models)
+    """
+    rng = np.random.default_rng(rng)
+    n_tables = len(chips)
+    means = chips.sum(axis=0) / np.maximum(hands.sum(axis=0), 1)
+
+    # resampled tables: counts of each table in each sample
+    counts = rng.multinomial(n_tables, np.full(n_tables, 1 / n_tables), size=n_bootstrap)
+    samples = (counts @ chips) / np.maximum(counts @ hands, 1)
+
+    order = np.argsort(-means, kind='stable')
+    intervals = np.percentile(samples, [2.5, 97.5], axis=0)
+    ranking = [{'model': model_names[m], 'chips_per_hand': float(means[m]),
+                'interval': [float(intervals[0, m]), float(intervals[1, m])]} for m in order]
+    pairs = [{'better': model_names[better], 'worse': model_names[worse],
+              'confidence': float(np.mean(samples[:, better] > samples[:, worse]))}
+             for better, worse in zip(order[:-1], order[1:])]
+    return ranking, pairs
+
+
+def run_until_resolved(log_dir, model_names=None, confidence=0.95, max_hands=100000, n_rounds=30,
+                       tournaments_per_step=None, table_size=TABLE_SIZE, n_workers=None, tournament_id=None,
+                       seed=None, sandbox=False, duplicate=False, n_bootstrap=10000, min_tables=20):
+    """
+    Plays tournaments until the ranking of the models is statistically resolved or max_hands are spent
+    :param log_dir: directory of the tables' logs (table_<nb>.jsonl) and of sequential_summary.yaml
+    :param confidence: confidence required for the whole ranking
+    :param max_hands: budget, in hands (rounds played by a table)
+    :param tournaments_per_step: tournaments played between two checks, default: enough to
+                                 give a table to each worker
+    :param min_tables: tables played before the ranking can be declared resolved
+    :param seed: seeds the seatings, the bootstrap and the tables (table i is played with seed + i)
+    :return: the summary written to sequential_summary.yaml: ranking, pairs with their confidence,
+             confidence reached (that of the least resolved pair), hands and tables spent
+    """
+    if model_names is None:
+        model_names = list_models()
+    model_names = sorted(set(model_names))
+    if tournament_id is None:
+        tournament_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+    os.makedirs(log_dir, exist_ok=True)
+
+    rng = random.Random(seed)
+    n_tables = len(make_tables(model_names, table_size))
+    if tournaments_per_step is None:
+        tournaments_per_step = max(1, math.ceil((n_workers or os.cpu_count()) / n_tables))
+
+    chips, hands = [], []
+    hands_spent, table_nb, step = 0, 0, 0
+    required = None
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker) as pool:
+        while True:
+            futures = []
+            for _ in range(tournaments_per_step):
+                seating = list(model_names)
+                rng.shuffle(seating)
+                for names in make_tables(seating, table_size):
+                    futures.append(pool.submit(play_table, table_nb, names,
+                                               join(log_dir, 'table_%d.jsonl' % table_nb), n_rounds, tournament_id,
+                                               None, None if seed is None else seed + table_nb, sandbox, duplicate))
+                    table_nb += 1
+            step += 1
+
+            step_hands = 0
+            for future in futures:
+                table = future.result()
+                step_hands += table['rounds_played']
+                table_chips, table_hands = table_totals(table['log_file'], model_names)
+                chips.append(table_chips)
+                hands.append(table_hands)
+            hands_spent += step_hands
+
+            if required is None:
+                # Bonferroni over the adjacent pairs and the steps the budget allows
+                max_steps = max(1, math.ceil(max_hands / max(step_hands, 1)))
+                required = 1 - (1 - confidence) / (max(len(model_names) - 1, 1) * max_steps)
+
+            ranking, pairs = ranking_confidence(np.array(chips), np.array(hands), model_names, n_bootstrap,
+                                                rng.getrandbits(64))
+            reached = min([pair['confidence'] for pair in pairs], default=1.)
+            if (reached >= required and table_nb >= min_tables) or hands_spent >= max_hands:
+                break
+
+    summary = {'tournament_ID': str(tournament_id),
+               'date': str(datetime.now()),
+               'resolved': reached >= required and table_nb >= min_tables,
+               'confidence_reached': reached,
+               'confidence_required': required,
+               'hands_spent': hands_spent,
+               'tables_played': table_nb,
+               'steps': step,
+               'ranking': ranking,
+               'pairs': pairs}
+    with open(join(log_dir, 'sequential_summary.yaml'), 'w', encoding='utf8') as outfile:
+        yaml.dump(summary, outfile, default_flow_style=False, allow_unicode=True, sort_keys=False)
+
+    return summary
@@ -1,3 +1,4 @@
+import asyncio
 from threading import Thread
 import functools
 
@@ -25,3 +26,35 @@ def timeout(time_delay):
             return ret
         return wrapper
     return deco
+
+
+async def run_in_thread(func, *args):
+    """
+    Awaits func(*args) run in a new daemon thread, as timeout does: a thread is never reused, so
+    a call abandoned at its deadline (e.g. by asyncio.wait_for) can go on running without holding
+    up later calls, nor the exit of the interpreter
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def set_outcome(result, exception):
+        # the future may have been cancelled at the deadline
+        if not future.done():
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+
+    def newFunc():
+        try:
+            outcome = (func(*args), None)
+        except Exception as e:
+            outcome = (None, e)
+        try:
+            loop.call_soon_threadsafe(set_outcome, *outcome)
+        except RuntimeError:
+            # the event loop was closed meanwhile
+            pass
+
+    Thread(target=newFunc, daemon=True).start()
+    return await future
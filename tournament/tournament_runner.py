@@ -0,0 +1,226 @@
+"""
+Multi-table tournament runner.
+
+The models are split into tables of at most TABLE_SIZE players, and the tables
+are played concurrently on a process pool. Each worker imports a model once
+and reuses it for every table it plays. Each table writes its own game log, and
+a summary of all the tables is written next to them.
+
+With the asyncio engine, all the tables are played by one event loop instead:
+while a model thinks, the other tables go on. Coroutine models are awaited and
+synchronous models run in a thread pool, so it pays off for slow models that
+release the GIL (numpy, I/O) or run in sandbox workers.
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+import importlib
+from multiprocessing import util
+import os
+from os.path import join
+import random
+import numpy as np
+import yaml
+from tournament.poker_game import Game
+from tournament.bot_protocol import BotPool
+
+TABLE_SIZE = 6
+MODELS_DIR = join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+
+# make_decision functions already imported (and bots already started) by this process, by model name
+_MODELS = {}
+
+
+def list_models(models_dir=MODELS_DIR):
+    """names of the models (python modules or bots) found in models_dir, in a stable order"""
+    return sorted(name for name in os.listdir(models_dir)
+                  if os.path.isfile(join(models_dir, name, name + '.py'))
+                  or os.path.isfile(join(models_dir, name, 'bot.yaml')))
+
+
+def make_tables(model_names, table_size=TABLE_SIZE):
+    """
+    Splits the models into tables of table_size players. A model left alone on
+    the last table is given an opponent: the first model plays twice.
+    :return: list of lists of model names
+    """
+    model_names = list(model_names)
+    if len(model_names) % table_size == 1:
+        model_names += [model_names[0]]
+    return [model_names[i:i + table_size] for i in range(0, len(model_names), table_size)]
+
+
+def load_model(model_name):
+    """
+    make_decision function of a model, imported once per process, or BotPool of a model
+    described by a bot.yaml file (see tournament.bot_protocol), shared by the process' tables
+    """
+    if model_name not in _MODELS:
+        bot_file = join(MODELS_DIR, model_name, 'bot.yaml')
+        if os.path.isfile(bot_file):
+            _MODELS[model_name] = BotPool.from_file(bot_file, name=model_name)
+        else:
+            _MODELS[model_name] = importlib.import_module('models.%s.%s' % (model_name, model_name)).make_decision
+    return _MODELS[model_name]
+
+
+def close_bots():
+    """stops the bots started by this process (they are started again when needed)"""
+    for model in _MODELS.values():
+        if isinstance(model, BotPool):
+            model.close()
+
+
+def init_worker():
+    """initializer of the pool's processes: the bots a process started are stopped when it exits"""
+    # run by multiprocessing when the process ends (atexit handlers are not)
+    util.Finalize(None, close_bots, exitpriority=10)
+
+
+def seatings(model_names, duplicate=False):
+    """
+    Seating of each game of a table: the models once or, in duplicate mode, every rotation of
+    the models, so that each model plays every seat's cards
+    """
+    model_names = list(model_names)
+    if not duplicate:
+        return [model_names]
+    return [model_names[rotation:] + model_names[:rotation] for rotation in range(len(model_names))]
+
+
+def play_table(table_nb, model_names, log_file, n_rounds=30, tournament_id='none', sinks=None, seed=None,
+               sandbox=False, duplicate=False):
+    """
+    Plays a game between model_names and writes its log to log_file
+    :param seed: seed of the random and numpy.random generators used by the deck and the
+                 models. None reseeds them from the OS, so that forked workers don't share a state
+    :param sandbox: run each model in its own worker process (see Game)
+    :param duplicate: play the same deals (generated from seed) once per rotation of the seats,
+                      the games being appended to the same streamed log
+    :return: summary of the table: its models, rounds played, final stacks and chips won
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    deals = Game.make_deals(n_rounds, seed) if duplicate else None
+    games = []
+    for names in seatings(model_names, duplicate):
+        game = Game(log_file, [load_model(name) for name in names], tournament_id=tournament_id, sinks=sinks,
+                    sandbox=sandbox, deals=deals)
+        game.play_game(n_rounds)
+        games.append((names, game))
+
+    return table_summary(table_nb, log_file, games)
+
+
+async def play_table_async(table_nb, model_names, log_file, n_rounds=30, tournament_id='none', sinks=None,
+                           seed=None, sandbox=False, executor=None, duplicate=False):
+    """
+    Coroutine version of play_table, for tables sharing an event loop
+    :param seed: seed of the table's deck, the models share the process' random generators
+    :param executor: executor of the synchronous models (see Game.play_game_async)
+    :return: summary of the table
+    """
+    rng = random.Random(seed)
+    deals = Game.make_deals(n_rounds, seed) if duplicate else None
+    games = []
+    # the rotations share their log: they are played one after the other
+    for names in seatings(model_names, duplicate):
+        game = Game(log_file, [load_model(name) for name in names], tournament_id=tournament_id, sinks=sinks,
+                    sandbox=sandbox, rng=rng, deals=deals)
+        await game.play_game_async(n_rounds, executor)
+        games.append((names, game))
+
+    return table_summary(table_nb, log_file, games)
+
+
+async def play_tables_async(tables, log_dir, n_rounds=30, tournament_id='none', seed=None, sandbox=False,
+                            duplicate=False):
+    """
+    Plays every table concurrently on the running event loop
+    :param tables: list of lists of model names
+    :param seed: table number i is played with seed + i, default: unseeded
+    :return: summaries of the tables
+    """
+    # threads of the workers (sandboxed models, bots), one per seat: they return by their deadline, so a
+    # decision never waits for a thread, which would eat into its timeout. Other synchronous models get
+    # a thread of their own for each decision
+    executor = ThreadPoolExecutor(max_workers=max(1, sum(len(names) for names in tables)))
+    try:
+        return await asyncio.gather(*[play_table_async(table_nb, names, join(log_dir, 'table_%d.jsonl' % table_nb),
+                                                       n_rounds, tournament_id, None,
+                                                       None if seed is None else seed + table_nb, sandbox, executor,
+                                                       duplicate)
+                                      for table_nb, names in enumerate(tables)])
+    finally:
+        executor.shutdown(wait=False)
+
+
+def table_summary(table_nb, log_file, games):
+    """
+    Summary of a played table: its models, rounds played, final stacks and chips won (chip_delta,
+    the sum of the per round deltas: in duplicate mode, the final stack is only the last deal's)
+    :param games: list of (model names, Game), one per seating
+    """
+    return {'table': table_nb,
+            'log_file': log_file,
+            'games': len(games),
+            'rounds_played': sum(game.round_nb for _, game in games),
+            'initial_stack': games[0][1].initial_stack,
+            'players': [{'ID': player.ID, 'model': name, 'stack': player.stack, 'chip_delta': delta}
+                        for names, game in games
+                        for player, name, delta in zip(game.players, names, game.chip_deltas)]}
+
+
+def summarize(tables):
+    """per model totals over the tables' summaries"""
+    models = {}
+    for table in tables:
+        for player in table['players']:
+            model = models.setdefault(player['model'], {'seats': 0, 'chip_delta': 0})
+            model['seats'] += 1
+            model['chip_delta'] += player['chip_delta']
+    return models
+
+
+def run_tournament(log_dir, model_names=None, n_rounds=30, table_size=TABLE_SIZE, n_workers=None,
+                   tournament_id=None, seed=None, sandbox=False, engine='processes', duplicate=False):
+    """
+    Plays every table of a tournament on a pool of n_workers processes (default: number of CPUs)
+    or, with the 'asyncio' engine, on one event loop of this process (n_workers is then ignored)
+    :param log_dir: directory of the tables' logs (table_<nb>.jsonl) and of summary.yaml
+    :param model_names: default: every model of the models directory
+    :param seed: table number i is played with seed + i, default: unseeded
+    :param sandbox: run each model in its own worker process (see Game)
+    :param duplicate: play each table in duplicate mode (see play_table)
+    :return: the summary written to summary.yaml
+    """
+    if model_names is None:
+        model_names = list_models()
+    if tournament_id is None:
+        tournament_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+    os.makedirs(log_dir, exist_ok=True)
+
+    tables = make_tables(model_names, table_size)
+    if engine == 'asyncio':
+        table_summaries = asyncio.run(play_tables_async(tables, log_dir, n_rounds, tournament_id, seed, sandbox,
+                                                        duplicate))
+        close_bots()
+    elif engine == 'processes':
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker) as pool:
+            futures = [pool.submit(play_table, table_nb, names, join(log_dir, 'table_%d.jsonl' % table_nb),
+                                   n_rounds, tournament_id, None, None if seed is None else seed + table_nb,
+                                   sandbox, duplicate)
+                       for table_nb, names in enumerate(tables)]
+            table_summaries = [future.result() for future in futures]
+    else:
+        raise ValueError("engine must be 'processes' or 'asyncio', got %s" % engine)
+
+    summary = {'tournament_ID': str(tournament_id),
+               'date': str(datetime.now()),
+               'n_rounds': n_rounds,
+               'tables': table_summaries,
+               'models': summarize(table_summaries)}
+    with open(join(log_dir, 'summary.yaml'), 'w', encoding='utf8') as outfile:
+        yaml.dump(summary, outfile, default_flow_style=False, allow_unicode=True)
+
+    return summary